@@ -0,0 +1,301 @@
+"""
+Микробенчмарки производительности
+"""
+
+import os
+import asyncio
+import tempfile
+import threading
+import time
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.routing import Route
+
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+import models
+from database import Base, create_sqlite_engine
+from services.rate_limiter import RateLimiter
+from services.ddos_protection import UserAgentFilter, DDoSProtectionMiddleware
+from services.checkout_service import CheckoutError, place_order
+from services.email_service import EmailService, TEMPLATES_DIR
+from schemas.payment import PaymentCreate
+
+USER_AGENT = b"Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/120.0"
+
+
+def _make_scope(path: str = "/ping") -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"localhost"), (b"user-agent", USER_AGENT)],
+        "client": ("127.0.0.1", 50000),
+        "server": ("localhost", 8000),
+    }
+
+
+async def _run_requests(app, count: int) -> float:
+    """Прогоняет count запросов напрямую через ASGI и возвращает время в секундах"""
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for _ in range(count):
+        await app(_make_scope(), receive, send)
+    return time.perf_counter() - start
+
+
+def _make_app() -> Starlette:
+    async def ping(request):
+        return PlainTextResponse("pong")
+
+    return Starlette(routes=[Route("/ping", ping)])
+
+
+def _make_legacy_app(rate_limiter, user_agent_filter) -> Starlette:
+    """Приложение с прежним middleware на базе @app.middleware("http")"""
+    app = _make_app()
+
+    @app.middleware("http")
+    async def ddos_protection_middleware(request: Request, call_next):
+        client_ip = request.client.host
+        user_agent = request.headers.get("user-agent", "")
+
+        if user_agent_filter.is_suspicious_user_agent(user_agent):
+            return Response(content="Доступ ограничен", status_code=403)
+
+        if not request.url.path.startswith("/static/"):
+            if rate_limiter.is_rate_limited(client_ip):
+                return Response(content="Слишком много запросов. Попробуйте позже.", status_code=429)
+
+        response = await call_next(request)
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        response.headers["X-Frame-Options"] = "DENY"
+        response.headers["X-XSS-Protection"] = "1; mode=block"
+        response.headers["X-DDoS-Protection"] = "Active"
+        return response
+
+    return app
+
+
+def benchmark_middleware(count: int = 20000):
+    """Накладные расходы DDoS middleware на один запрос: до и после"""
+    print("🧪 Бенчмарк DDoS middleware...")
+
+    def limiter():
+        # Лимит заведомо не достигается - измеряем только накладные расходы
+        return RateLimiter(max_requests_per_minute=10 ** 9)
+
+    bare_app = _make_app()
+    legacy_app = _make_legacy_app(limiter(), UserAgentFilter())
+    asgi_app = _make_app()
+    asgi_app.add_middleware(DDoSProtectionMiddleware, rate_limiter=limiter(), user_agent_filter=UserAgentFilter())
+
+    results = {}
+    for name, app in [("без middleware", bare_app),
+                      ("@app.middleware(\"http\")", legacy_app),
+                      ("ASGI middleware", asgi_app)]:
+        asyncio.run(_run_requests(app, 500))  # Прогрев
+        elapsed = asyncio.run(_run_requests(app, count))
+        results[name] = elapsed / count * 1_000_000
+
+    baseline = results["без middleware"]
+    print(f"\n📊 Результаты ({count} запросов):")
+    for name, per_request in results.items():
+        print(f"  {name}: {per_request:.1f} мкс/запрос (накладные расходы {per_request - baseline:.1f} мкс)")
+
+def _mixed_workload(engine, seconds: float, readers: int, writers: int) -> dict:
+    """Параллельные чтения каталога и записи отзывов; считает операции и ошибки блокировки"""
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(models.Category.__table__.insert(), {"id": 1, "name": "Тест"})
+        conn.execute(
+            models.Product.__table__.insert(),
+            [{"name": f"Товар {i}", "price": i, "category_id": 1, "stock_quantity": 10} for i in range(500)]
+        )
+
+    counters = {"reads": 0, "writes": 0, "locked": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def count(key):
+        with lock:
+            counters[key] += 1
+
+    def reader():
+        while time.perf_counter() < deadline:
+            try:
+                with engine.connect() as conn:
+                    conn.execute(text(
+                        "SELECT id, name, price FROM products WHERE category_id = 1 ORDER BY price LIMIT 24"
+                    )).fetchall()
+                count("reads")
+            except OperationalError:
+                count("locked")
+
+    def writer(worker_id):
+        i = 0
+        while time.perf_counter() < deadline:
+            i += 1
+            try:
+                with engine.begin() as conn:
+                    conn.execute(models.Review.__table__.insert(), {
+                        "customer_id": worker_id, "product_id": i % 500 + 1, "rating": 5, "comment": "Отлично"
+                    })
+                    conn.execute(text(
+                        "UPDATE products SET review_count = review_count + 1, rating_sum = rating_sum + 5 "
+                        "WHERE id = :product"
+                    ), {"product": i % 500 + 1})
+                count("writes")
+            except OperationalError:
+                count("locked")
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer, args=(i + 1,)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+    return counters
+
+
+def benchmark_sqlite_engine(seconds: float = 3.0, readers: int = 4, writers: int = 4):
+    """Пропускная способность смешанной нагрузки: прежний движок и настроенный"""
+    print(f"\n🧪 Бенчмарк SQLite ({readers} читателей, {writers} писателей, {seconds} с)...")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        before_url = f"sqlite:///{os.path.join(tmp, 'before.db')}"
+        after_url = f"sqlite:///{os.path.join(tmp, 'after.db')}"
+        engines = [
+            ("create_engine по умолчанию", create_engine(before_url, connect_args={"check_same_thread": False})),
+            ("create_sqlite_engine", create_sqlite_engine(after_url)),
+        ]
+        for name, engine in engines:
+            results[name] = _mixed_workload(engine, seconds, readers, writers)
+
+    print("\n📊 Результаты:")
+    for name, counters in results.items():
+        total = counters["reads"] + counters["writes"]
+        print(f"  {name}: {total / seconds:.0f} опер./с (чтений {counters['reads']}, "
+              f"записей {counters['writes']}, ошибок блокировки {counters['locked']})")
+
+
+
+def benchmark_checkout(orders: int = 500, concurrency: int = 16, products: int = 20, stock: int = 100):
+    """Заказов в секунду при параллельном оформлении и проверка, что склад не ушел в минус"""
+    print(f"\n🧪 Бенчмарк оформления заказов ({orders} заказов, {concurrency} параллельно)...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "checkout.db")
+        sync_engine = create_sqlite_engine(f"sqlite:///{path}")
+        Base.metadata.create_all(sync_engine)
+        with sync_engine.begin() as conn:
+            conn.execute(models.Category.__table__.insert(), {"id": 1, "name": "Тест"})
+            conn.execute(
+                models.Product.__table__.insert(),
+                [{"id": i + 1, "name": f"Товар {i}", "price": 100 + i, "category_id": 1, "stock_quantity": stock}
+                 for i in range(products)]
+            )
+
+        async_engine = create_sqlite_engine(f"sqlite+aiosqlite:///{path}", async_engine=True)
+        session_factory = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+        counters = {"placed": 0, "rejected": 0}
+
+        async def checkout(i: int, semaphore: asyncio.Semaphore):
+            # Три позиции из разных товаров, суммой не интересуемся (amount=None)
+            items = [{"product_id": (i + k) % products + 1, "quantity": k + 1} for k in range(3)]
+            payment = PaymentCreate(customer_email=f"user{i}@example.com", items=items)
+            async with semaphore:
+                async with session_factory() as db:
+                    try:
+                        await place_order(db, payment, customer_id=i % 50 + 1)
+                        counters["placed"] += 1
+                    except CheckoutError:
+                        counters["rejected"] += 1
+
+        async def run() -> float:
+            semaphore = asyncio.Semaphore(concurrency)
+            start = time.perf_counter()
+            await asyncio.gather(*(checkout(i, semaphore) for i in range(orders)))
+            elapsed = time.perf_counter() - start
+            await async_engine.dispose()
+            return elapsed
+
+        elapsed = asyncio.run(run())
+
+        with sync_engine.connect() as conn:
+            sold = conn.execute(select(func.coalesce(func.sum(models.OrderItem.quantity), 0))).scalar()
+            left = conn.execute(select(func.sum(models.Product.stock_quantity))).scalar()
+            negative = conn.execute(select(func.count()).where(models.Product.stock_quantity < 0)).scalar()
+            order_count = conn.execute(select(func.count(models.Order.id))).scalar()
+            payment_count = conn.execute(select(func.count(models.Payment.id))).scalar()
+        sync_engine.dispose()
+
+    print("\n📊 Результаты:")
+    print(f"  Оформлено: {counters['placed']}, отказано (нет на складе): {counters['rejected']}")
+    print(f"  Пропускная способность: {orders / elapsed:.0f} заказов/с ({elapsed:.2f} с)")
+    print(f"  Заказов {order_count}, платежей {payment_count}; продано {sold} + осталось {left} "
+          f"= {sold + left} из {products * stock}; товаров с отрицательным остатком: {negative}")
+
+
+
+def benchmark_receipts(count: int = 2000):
+    """Чеков в секунду: компиляция шаблона на каждый чек и общий Environment"""
+    print(f"\n🧪 Бенчмарк генерации чеков ({count} чеков)...")
+    from jinja2 import Template
+
+    receipt = {
+        "payment_id": 1, "payment_date": "01.01.2025 12:00", "order_id": 1,
+        "customer_email": "buyer@example.com", "customer_phone": "+7 900 000-00-00",
+        "payment_method": "demo_card", "total_amount": 129990.0,
+        "items": [{"name": f"Товар {i}", "quantity": i + 1, "price": 1000.0 + i, "category": "Тест"} for i in range(5)]
+    }
+    source = (TEMPLATES_DIR / "emails" / "receipt.html").read_text(encoding="utf-8")
+    service = EmailService()
+
+    def render_inline():
+        # Как раньше: шаблон разбирается и компилируется для каждого чека
+        return Template(source).render(**receipt, generation_time="01.01.2025 12:00")
+
+    results = {}
+    for name, render in [
+        ("Template(...) на каждый чек", render_inline),
+        ("общий Environment", lambda: service._generate_receipt_html(receipt)),
+    ]:
+        render()  # прогрев
+        start = time.perf_counter()
+        for _ in range(count):
+            render()
+        results[name] = count / (time.perf_counter() - start)
+
+    print("\n📊 Результаты:")
+    for name, per_second in results.items():
+        print(f"  {name}: {per_second:.0f} чеков/с")
+
+
+if __name__ == "__main__":
+    print("🚀 Запуск бенчмарков...")
+
+    benchmark_middleware()
+    benchmark_sqlite_engine()
+    benchmark_checkout()
+    benchmark_receipts()
+
+    print("\n🎉 Бенчмарки завершены!")
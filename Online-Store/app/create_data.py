@@ -1,14 +1,10 @@
 import os
 import sys
-import bcrypt
 from sqlalchemy.orm import Session
 from database import SessionLocal, engine
 import models
-
-
-def hash_password(password: str) -> str:
-    """Хеширование пароля"""
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+from migrations import migrate
+from services.user_import import import_users, print_import_report
 
 
 def create_sample_data():
@@ -92,25 +88,13 @@ def create_sample_data():
         
         print("✅ Товары созданы")
 
-        # Создаем администратора
-        admin_user = models.Customer(
-            name="Администратор",
-            email="admin@example.com",
-            hashed_password=hash_password("admin123"),
-            role="admin"  # Используем "admin" вместо "director" для совместимости
-        )
-        db.add(admin_user)
-        
-        # Создаем обычного пользователя
-        customer_user = models.Customer(
-            name="Иван Покупатель",
-            email="customer@example.com",
-            hashed_password=hash_password("customer123"),
-            role="customer"
-        )
-        db.add(customer_user)
-        
-        db.commit()
+        # Создаем администратора и обычного пользователя
+        stats = import_users([
+            # Используем "admin" вместо "director" для совместимости
+            {"name": "Администратор", "email": "admin@example.com", "password": "admin123", "role": "admin"},
+            {"name": "Иван Покупатель", "email": "customer@example.com", "password": "customer123", "role": "customer"},
+        ], verbose=False)
+        print_import_report(stats)
         
         print("\n🎉 Тестовые данные успешно добавлены!")
         print("\n👥 Пользователи:")
@@ -137,7 +121,7 @@ def create_sample_data():
 
 
 if __name__ == "__main__":
-    # Создаем таблицы если их нет
-    print("🔄 Создание таблиц в базе данных...")
-    models.Base.metadata.create_all(bind=engine)
+    # Создаем или обновляем таблицы
+    print("🔄 Применение миграций базы данных...")
+    migrate(engine)
     create_sample_data()
\ No newline at end of file
@@ -0,0 +1,122 @@
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional
+from sqlalchemy.orm import Session, joinedload
+from models import CartItem, Product
+
+# Сколько секунд товар в корзине остается зарезервированным без обращений к корзине
+RESERVATION_TTL = int(os.getenv("CART_RESERVATION_TTL", 900))
+
+class InsufficientStock(Exception):
+    """На складе недостаточно товара для резерва"""
+
+class CartConflict(Exception):
+    """Строка корзины одновременно изменена другим запросом"""
+
+def reserve_stock(db: Session, product_id: int, quantity: int) -> bool:
+    """Атомарно списывает товар со склада (без commit).
+
+    Один UPDATE ... WHERE stock_quantity >= quantity: проверка и списание
+    выполняются в одной операции, поэтому параллельные запросы не могут
+    продать больше, чем есть на складе. Товар без цены не резервируется.
+    """
+    updated = db.query(Product).filter(
+        Product.id == product_id,
+        Product.price.isnot(None),
+        Product.stock_quantity >= quantity
+    ).update({Product.stock_quantity: Product.stock_quantity - quantity}, synchronize_session=False)
+    return updated == 1
+
+def release_stock(db: Session, product_id: int, quantity: int) -> None:
+    """Возвращает товар на склад (без commit)"""
+    db.query(Product).filter(Product.id == product_id).update(
+        {Product.stock_quantity: Product.stock_quantity + quantity}, synchronize_session=False
+    )
+
+def get_cart(db: Session, customer_id: int) -> List[CartItem]:
+    """Строки корзины покупателя вместе с товарами"""
+    return db.query(CartItem).options(joinedload(CartItem.product)).filter(
+        CartItem.customer_id == customer_id
+    ).order_by(CartItem.id).all()
+
+def set_cart_quantity(db: Session, customer_id: int, product_id: int, quantity: int,
+                      relative: bool = False) -> Optional[CartItem]:
+    """Устанавливает количество товара в корзине и меняет резерв на разницу (без commit).
+
+    relative=True прибавляет quantity к текущему количеству; итоговое 0 удаляет строку. Бросает InsufficientStock, если товара не хватает,
+    и CartConflict, если строку параллельно изменил другой запрос; в обоих
+    случаях транзакцию нужно откатить.
+    """
+    item = db.query(CartItem).filter(
+        CartItem.customer_id == customer_id,
+        CartItem.product_id == product_id
+    ).first()
+    current = item.quantity if item else 0
+    if relative:
+        quantity += current
+    delta = quantity - current
+
+    if delta > 0 and not reserve_stock(db, product_id, delta):
+        raise InsufficientStock(product_id)
+    if delta < 0:
+        release_stock(db, product_id, -delta)
+
+    reserved_until = datetime.utcnow() + timedelta(seconds=RESERVATION_TTL)
+    if item is None:
+        if quantity == 0:
+            return None
+        item = CartItem(customer_id=customer_id, product_id=product_id,
+                        quantity=quantity, reserved_until=reserved_until)
+        db.add(item)
+        db.flush()
+        return item
+
+    # Меняем строку, только если ее количество не изменилось с момента чтения
+    query = db.query(CartItem).filter(CartItem.id == item.id, CartItem.quantity == current)
+    if quantity == 0:
+        updated = query.delete(synchronize_session=False)
+    else:
+        updated = query.update({
+            CartItem.quantity: quantity,
+            CartItem.reserved_until: reserved_until
+        }, synchronize_session=False)
+    if updated != 1:
+        raise CartConflict(product_id)
+    if quantity == 0:
+        db.expunge(item)
+        return None
+    db.refresh(item)
+    return item
+
+def extend_reservations(db: Session, customer_id: int) -> None:
+    """Продлевает резерв всех товаров покупателя (без commit)"""
+    db.query(CartItem).filter(
+        CartItem.customer_id == customer_id,
+        CartItem.reserved_until >= datetime.utcnow()
+    ).update({CartItem.reserved_until: datetime.utcnow() + timedelta(seconds=RESERVATION_TTL)},
+             synchronize_session=False)
+
+def release_expired_reservations(db: Session, customer_id: Optional[int] = None,
+                                 now: Optional[datetime] = None) -> int:
+    """Возвращает на склад товары из брошенных корзин (без commit).
+
+    Строка удаляется условным DELETE, и товар возвращается, только если
+    удаление прошло, поэтому параллельная очистка не вернет товар дважды.
+    customer_id ограничивает очистку корзиной одного покупателя.
+    """
+    now = now or datetime.utcnow()
+    query = db.query(CartItem.id, CartItem.product_id, CartItem.quantity).filter(CartItem.reserved_until < now)
+    if customer_id is not None:
+        query = query.filter(CartItem.customer_id == customer_id)
+    expired = query.all()
+
+    released = 0
+    for item_id, product_id, quantity in expired:
+        deleted = db.query(CartItem).filter(
+            CartItem.id == item_id,
+            CartItem.reserved_until < now
+        ).delete(synchronize_session=False)
+        if deleted == 1:
+            release_stock(db, product_id, quantity)
+            released += 1
+    return released
@@ -0,0 +1,117 @@
+import os
+import hashlib
+from datetime import datetime, timedelta
+from pydantic import BaseModel
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import IdempotencyKey
+
+# Сколько секунд хранится ответ на запрос с ключом идемпотентности
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", 24 * 3600))
+
+def request_hash(payload: BaseModel) -> str:
+    """Отпечаток тела запроса: повтор с тем же ключом должен совпадать с оригиналом"""
+    return hashlib.sha256(payload.model_dump_json().encode("utf-8")).hexdigest()
+
+async def claim_key(db: AsyncSession, customer_id: int, key: str, request_hash: str, lock_timeout: int):
+    """Занимает ключ за текущим запросом на lock_timeout секунд.
+
+    Возвращает None, если ключ свободен и теперь принадлежит этому запросу,
+    иначе существующую запись (request_hash, response_json). Повтор
+    завершенного запроса только читает ключ и не берет блокировку записи;
+    свободный ключ занимается с commit, чтобы его увидели параллельные
+    запросы. Ключ с истекшим сроком занимается заново (удаляет их
+    pending_payment_sweeper).
+    """
+    stored = await get_key(db, customer_id, key)
+    if stored is not None:
+        return stored
+
+    now = datetime.utcnow()
+    stmt = insert(IdempotencyKey).values(
+        customer_id=customer_id,
+        key=key,
+        request_hash=request_hash,
+        expires_at=now + timedelta(seconds=lock_timeout)
+    )
+    result = await db.execute(stmt.on_conflict_do_update(
+        index_elements=[IdempotencyKey.customer_id, IdempotencyKey.key],
+        set_={
+            "request_hash": stmt.excluded.request_hash,
+            "response_json": None,
+            "expires_at": stmt.excluded.expires_at
+        },
+        where=IdempotencyKey.expires_at < now
+    ))
+    await db.commit()
+    if result.rowcount == 1:
+        return None
+    # Ключ занял параллельный запрос
+    return await get_key(db, customer_id, key)
+
+async def get_key(db: AsyncSession, customer_id: int, key: str):
+    """Запись ключа (request_hash, response_json) или None, если ключа нет"""
+    result = await db.execute(
+        select(IdempotencyKey.request_hash, IdempotencyKey.response_json).where(
+            IdempotencyKey.customer_id == customer_id,
+            IdempotencyKey.key == key,
+            IdempotencyKey.expires_at >= datetime.utcnow()
+        )
+    )
+    return result.first()
+
+async def complete_key(db: AsyncSession, customer_id: int, key: str, response_json: str) -> None:
+    """Сохраняет ответ на запрос (без commit - вместе с платежом)"""
+    await db.execute(
+        update(IdempotencyKey).where(
+            IdempotencyKey.customer_id == customer_id,
+            IdempotencyKey.key == key
+        ).values(response_json=response_json,
+                 expires_at=datetime.utcnow() + timedelta(seconds=IDEMPOTENCY_TTL))
+    )
+
+async def hold_key(db: AsyncSession, customer_id: int, key: str) -> None:
+    """Оставляет ключ незавершенным на IDEMPOTENCY_TTL (без commit).
+
+    Повторы получают "запрос еще выполняется", пока результат не сверен вручную.
+    """
+    await db.execute(
+        update(IdempotencyKey).where(
+            IdempotencyKey.customer_id == customer_id,
+            IdempotencyKey.key == key
+        ).values(expires_at=datetime.utcnow() + timedelta(seconds=IDEMPOTENCY_TTL))
+    )
+
+async def forget_key(db: AsyncSession, customer_id: int, key: str) -> None:
+    """Удаляет ключ вместе с сохраненным ответом (без commit)"""
+    await db.execute(
+        delete(IdempotencyKey).where(
+            IdempotencyKey.customer_id == customer_id,
+            IdempotencyKey.key == key
+        )
+    )
+
+async def forget_expired_keys(db: AsyncSession) -> None:
+    """Удаляет все ключи с истекшим сроком (без commit)"""
+    await db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at < datetime.utcnow()))
+
+async def forget_expired_locks(db: AsyncSession) -> None:
+    """Удаляет незавершенные ключи с истекшей арендой (без commit)"""
+    await db.execute(
+        delete(IdempotencyKey).where(
+            IdempotencyKey.response_json.is_(None),
+            IdempotencyKey.expires_at < datetime.utcnow()
+        )
+    )
+
+async def release_key(db: AsyncSession, customer_id: int, key: str) -> None:
+    """Освобождает ключ после неудачного запроса, чтобы его можно было повторить"""
+    await db.execute(
+        delete(IdempotencyKey).where(
+            IdempotencyKey.customer_id == customer_id,
+            IdempotencyKey.key == key,
+            IdempotencyKey.response_json.is_(None)
+        )
+    )
+    await db.commit()
\ No newline at end of file
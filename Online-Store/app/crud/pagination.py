@@ -0,0 +1,100 @@
+import json
+import base64
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import and_, false, or_
+
+def encode_cursor(values: list) -> str:
+    """Кодирует значения ключа сортировки последней строки в курсор"""
+    payload = [{"dt": value.isoformat()} if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Optional[list]:
+    """Декодирует курсор; для некорректного значения возвращает None"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw.decode("utf-8"))
+        if not isinstance(payload, list):
+            return None
+        return [datetime.fromisoformat(value["dt"]) if isinstance(value, dict) else value for value in payload]
+    except (KeyError, ValueError, TypeError):
+        return None
+
+def _key_value(row, column):
+    """Значение ключа сортировки из строки: объекта модели или кортежа с доп. колонками"""
+    mapping = getattr(row, "_mapping", None)
+    if mapping is None:
+        return getattr(row, column.key)
+    if column.key in mapping:
+        return mapping[column.key]
+    return getattr(row[0], column.key)
+
+def _nullable(column) -> bool:
+    """Может ли колонка ключа быть NULL (у выражений вроде ранга поиска - нет)"""
+    return bool(getattr(getattr(column, "expression", column), "nullable", False))
+
+def _equal(column, value):
+    return column.is_(None) if value is None else column == value
+
+def _after(column, value, descending: bool):
+    """Условие "строго после value" в порядке сортировки колонки.
+
+    В SQLite NULL меньше любого значения: при ASC такие строки идут
+    первыми, при DESC - последними. Простое сравнение с NULL всегда
+    ложно, поэтому без этих веток страницы обрывались бы на товаре без цены.
+    """
+    if value is None:
+        return false() if descending else column.is_not(None)
+    if descending:
+        return or_(column < value, column.is_(None)) if _nullable(column) else column < value
+    return column > value
+
+def _keyset_query(query, order: List[Tuple], cursor: Optional[str], page_size: int):
+    """Добавляет к запросу условие "после курсора", сортировку и LIMIT"""
+    values = decode_cursor(cursor) if cursor else None
+    if values is not None and len(values) == len(order):
+        # (k1, k2, ...) > (v1, v2, ...) с учетом направления каждой колонки
+        conditions = []
+        for i, (column, descending) in enumerate(order):
+            equal_prefix = [_equal(order[j][0], values[j]) for j in range(i)]
+            conditions.append(and_(*equal_prefix, _after(column, values[i], descending)))
+        query = query.filter(or_(*conditions))
+
+    query = query.order_by(*[column.desc() if descending else column.asc() for column, descending in order])
+    return query.limit(page_size + 1)
+
+def _keyset_page(rows: list, order: List[Tuple], page_size: int):
+    """Отрезает лишнюю строку и строит курсор следующей страницы"""
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor([_key_value(last, column) for column, _ in order])
+    return rows, next_cursor
+
+def keyset_paginate(query, order: List[Tuple], cursor: Optional[str] = None, page_size: int = 20):
+    """Постраничная выборка по ключу (keyset pagination).
+
+    order - список пар (колонка, по убыванию); последней должна идти
+    уникальная колонка (обычно id). Вместо OFFSET строится условие
+    "строго после последней строки предыдущей страницы", поэтому
+    стоимость выборки не зависит от номера страницы.
+
+    Возвращает (строки страницы, курсор следующей страницы или None).
+    """
+    rows = _keyset_query(query, order, cursor, page_size).all()
+    return _keyset_page(rows, order, page_size)
+
+async def keyset_paginate_async(db, stmt, order: List[Tuple], cursor: Optional[str] = None, page_size: int = 20):
+    """То же для AsyncSession; stmt - select() одной модели"""
+    rows = (await db.scalars(_keyset_query(stmt, order, cursor, page_size))).all()
+    return _keyset_page(list(rows), order, page_size)
+
+def clamp_page_size(page_size, default: int, maximum: int = 100) -> int:
+    """Приводит размер страницы из запроса к допустимому диапазону"""
+    try:
+        page_size = int(page_size)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(page_size, maximum))
@@ -0,0 +1,43 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, case
+from models import Product, Review
+
+def update_product_rating(db: Session, product_id: int, rating: int, delta: int = 1) -> None:
+    """Инкрементально обновляет агрегаты рейтинга товара (без commit).
+
+    delta=1 - учесть одобренный отзыв, delta=-1 - исключить его.
+    Обновление выполняется одним UPDATE в текущей транзакции,
+    поэтому коммитится вместе с изменением самого отзыва.
+    """
+    new_count = Product.review_count + delta
+    new_sum = Product.rating_sum + delta * rating
+    db.query(Product).filter(Product.id == product_id).update({
+        Product.review_count: new_count,
+        Product.rating_sum: new_sum,
+        Product.average_rating: case(
+            (new_count > 0, new_sum * 1.0 / new_count),
+            else_=0.0
+        )
+    }, synchronize_session=False)
+
+def recalculate_product_ratings(db: Session) -> None:
+    """Полный пересчет агрегатов рейтинга по одобренным отзывам (без commit)"""
+    rows = db.query(
+        Review.product_id,
+        func.count(Review.id),
+        func.sum(Review.rating)
+    ).filter(
+        Review.is_approved == True
+    ).group_by(Review.product_id).all()
+
+    db.query(Product).update({
+        Product.review_count: 0,
+        Product.rating_sum: 0,
+        Product.average_rating: 0.0
+    }, synchronize_session=False)
+    for product_id, count, rating_sum in rows:
+        db.query(Product).filter(Product.id == product_id).update({
+            Product.review_count: count,
+            Product.rating_sum: rating_sum,
+            Product.average_rating: rating_sum / count
+        }, synchronize_session=False)
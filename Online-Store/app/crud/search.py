@@ -0,0 +1,73 @@
+import re
+from typing import Optional
+from sqlalchemy import text, func, literal_column, table, column
+from models import Product
+
+# Полнотекстовый индекс по названию и описанию товара (SQLite FTS5).
+# unicode61 приводит кириллицу к нижнему регистру, а префиксные индексы
+# ускоряют поиск по началу слова ("смартфон*" найдет "смартфоны").
+SEARCH_INDEX_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        name, description,
+        content='products', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF name, description ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO products_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+]
+
+SEARCH_INDEX_OBJECTS = ("products_fts", "products_fts_insert", "products_fts_delete", "products_fts_update")
+
+products_fts = table("products_fts", column("rowid"))
+
+def ensure_search_index(conn) -> None:
+    """Создает индекс и триггеры синхронизации; перестраивает индекс, если чего-то не хватало"""
+    existing = {
+        row[0] for row in conn.execute(text("SELECT name FROM sqlite_master WHERE name LIKE 'products_fts%'"))
+    } & set(SEARCH_INDEX_OBJECTS)
+    for ddl in SEARCH_INDEX_DDL:
+        conn.execute(text(ddl))
+    # Триггеры удаляются вместе с таблицей products, поэтому индекс мог устареть
+    if existing != set(SEARCH_INDEX_OBJECTS):
+        conn.execute(text("INSERT INTO products_fts(products_fts) VALUES ('rebuild')"))
+
+def build_match_query(search: str) -> Optional[str]:
+    """Преобразует поисковую строку в запрос FTS5: все слова, каждое - как префикс"""
+    words = re.findall(r"\w+", search.lower())
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+def apply_search(query, match_query: str, ranked: bool):
+    """Ограничивает запрос товаров результатами полнотекстового поиска.
+
+    При ranked=True в выборку добавляется колонка search_rank (BM25,
+    меньше - релевантнее) для сортировки по релевантности.
+    """
+    fts_column = literal_column("products_fts")
+    query = query.join(products_fts, products_fts.c.rowid == Product.id).filter(
+        fts_column.op("MATCH")(match_query)
+    )
+    if ranked:
+        # Веса колонок: совпадение в названии важнее, чем в описании
+        search_rank = func.bm25(fts_column, 10.0, 1.0).label("search_rank")
+        query = query.add_columns(search_rank, Product.id)
+        return query, search_rank
+    return query, None
@@ -1,19 +1,226 @@
-from sqlalchemy import create_engine
+import os
+import time
+import sqlite3
+import threading
+from functools import partial
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./shop.db"
+from services.log_service import get_logger
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+logger = get_logger("database")
+
+# Синхронный путь: обычные def-маршруты (FastAPI выполняет их в пуле потоков),
+# скрипты (seed.py, migrations.py, import_users.py) и зависимость get_current_user.
+#
+# Асинхронный путь (aiosqlite): async def-маршруты, которые не должны блокировать
+# event loop запросами к БД:
+#   POST /payments/create, GET /payments/success/{id}, GET /payments/{id},
+#   GET /payments/customer/my, POST /auth/login, POST /auth/register
+#   и фоновая отправка чека. bcrypt в /auth выполняется в ограниченном пуле.
+# GET /checkout/ к БД не обращается.
+
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./shop.db")
+ASYNC_DATABASE_URL = SQLALCHEMY_DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+
+# Настройки соединения SQLite (переменные окружения):
+# WAL позволяет читать параллельно с записью, synchronous=NORMAL в режиме WAL
+# не теряет целостность, busy_timeout заставляет ждать блокировку вместо
+# немедленной ошибки "database is locked".
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000)),
+    "cache_size": -int(os.getenv("SQLITE_CACHE_SIZE_KB", 20000)),  # Отрицательное значение - в КиБ
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+    "temp_store": "MEMORY",
+}
+
+POOL_SETTINGS = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", 10)),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 20)),
+    "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", 30)),
+    # Кеш скомпилированных SQLAlchemy-запросов
+    "query_cache_size": int(os.getenv("DB_QUERY_CACHE_SIZE", 1000)),
+}
+
+# Кеш подготовленных выражений sqlite3 на каждом соединении
+STATEMENT_CACHE_SIZE = int(os.getenv("SQLITE_STATEMENT_CACHE", 256))
+
+
+def _apply_pragmas(pragmas: dict, dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def create_sqlite_engine(url: str = SQLALCHEMY_DATABASE_URL, async_engine: bool = False,
+                         pragmas: dict = None, **overrides):
+    """Создает движок SQLite с прагмами, пулом и кешем выражений"""
+    pragmas = SQLITE_PRAGMAS if pragmas is None else pragmas
+    settings = {**POOL_SETTINGS, **overrides}
+    connect_args = {
+        "check_same_thread": False,
+        "timeout": pragmas.get("busy_timeout", 5000) / 1000,
+        "cached_statements": STATEMENT_CACHE_SIZE,
+    }
+
+    if async_engine:
+        new_engine = create_async_engine(url, connect_args=connect_args, **settings)
+        event.listen(new_engine.sync_engine, "connect", partial(_apply_pragmas, pragmas))
+    else:
+        new_engine = create_engine(url, connect_args=connect_args, **settings)
+        event.listen(new_engine, "connect", partial(_apply_pragmas, pragmas))
+    return new_engine
+
+
+engine = create_sqlite_engine()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_sqlite_engine(ASYNC_DATABASE_URL, async_engine=True)
+
+# expire_on_commit=False: после commit атрибуты читаются без повторного запроса
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
+
+class ReadRouter:
+    """Выдает сессии для маршрутов, которые только читают данные.
+
+    Режим задается READ_DB_MODE:
+    primary - чтение через основной пул (как запись);
+    readonly - отдельный пул соединений только для чтения к тому же файлу
+    (в режиме WAL читатели не ждут писателей, данные всегда актуальны);
+    snapshot - копия базы READ_SNAPSHOT_PATH, которая обновляется через
+    backup API, если она старше READ_MAX_STALENESS_SECONDS. Обновление
+    идет в фоновом потоке: запросы тем временем читают прежний снимок,
+    а если обновить его не удалось (SQLITE_BUSY/LOCKED), прежний снимок
+    остается в работе и попытка повторяется через max_staleness секунд.
+    Пока первого снимка нет, чтение идет через основной пул.
+
+    Запись и чтение собственных изменений (например, add_review) всегда
+    идут через основную сессию get_db.
+    """
+
+    def __init__(self, mode: str = "primary", primary_url: str = SQLALCHEMY_DATABASE_URL,
+                 snapshot_path: str = "./shop_read.db", max_staleness: float = 5.0):
+        self.mode = mode
+        self.primary_path = make_url(primary_url).database
+        self.snapshot_path = snapshot_path
+        self.max_staleness = max_staleness
+        self.refreshed_at = None
+        self.refreshes = 0
+        self.failed_refreshes = 0
+        self._retry_at = 0.0
+        self._refresh_lock = threading.Lock()
+
+        read_pragmas = {name: value for name, value in SQLITE_PRAGMAS.items() if name != "journal_mode"}
+        read_pragmas["query_only"] = 1
+        if mode == "readonly":
+            self.engine = create_sqlite_engine(
+                f"sqlite:///file:{self.primary_path}?mode=ro&uri=true", pragmas=read_pragmas
+            )
+        elif mode == "snapshot":
+            self.engine = create_sqlite_engine(f"sqlite:///{snapshot_path}", pragmas=read_pragmas)
+        else:
+            self.engine = engine
+        self._sessionmaker = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+
+    def refresh_snapshot(self):
+        """Копирует основную базу в снимок (страницы копируются без блокировки писателей)"""
+        source = sqlite3.connect(self.primary_path)
+        target = sqlite3.connect(self.snapshot_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+        self.refreshed_at = time.monotonic()
+        self.refreshes += 1
+
+    def _try_refresh(self) -> bool:
+        """refresh_snapshot без исключений: при ошибке остается прежний снимок"""
+        try:
+            self.refresh_snapshot()
+            return True
+        except sqlite3.Error as e:
+            self.failed_refreshes += 1
+            self._retry_at = time.monotonic() + self.max_staleness
+            logger.warning("Снимок базы для чтения не обновлен, используется прежний: %s", e)
+            return False
+
+    def _refresh_in_background(self):
+        try:
+            self._try_refresh()
+        finally:
+            self._refresh_lock.release()
+
+    def _ensure_fresh(self) -> bool:
+        """Запускает обновление устаревшего снимка; False - снимка еще нет"""
+        now = time.monotonic()
+        if now < self._retry_at:
+            return self.refreshed_at is not None
+
+        if self.refreshed_at is None:
+            # Первый снимок создается в запросе; пока его нет, читаем основную базу
+            with self._refresh_lock:
+                return self.refreshed_at is not None or self._try_refresh()
+
+        if now - self.refreshed_at > self.max_staleness:
+            # Обновляет один фоновый поток, запросы пока читают текущий снимок
+            if self._refresh_lock.acquire(blocking=False):
+                try:
+                    threading.Thread(target=self._refresh_in_background, name="read-snapshot", daemon=True).start()
+                except Exception:
+                    self._refresh_lock.release()
+                    raise
+        return True
+
+    def session(self):
+        if self.mode == "snapshot" and not self._ensure_fresh():
+            return SessionLocal()
+        return self._sessionmaker()
+
+    def stats(self) -> dict:
+        lag = None
+        if self.refreshed_at is not None:
+            lag = round(time.monotonic() - self.refreshed_at, 2)
+        return {
+            "mode": self.mode,
+            "max_staleness_seconds": self.max_staleness if self.mode == "snapshot" else 0,
+            "snapshot_age_seconds": lag,
+            "snapshot_refreshes": self.refreshes,
+            "snapshot_failed_refreshes": self.failed_refreshes
+        }
+
+
+read_router = ReadRouter(
+    mode=os.getenv("READ_DB_MODE", "primary").lower(),
+    snapshot_path=os.getenv("READ_SNAPSHOT_PATH", "./shop_read.db"),
+    max_staleness=float(os.getenv("READ_MAX_STALENESS_SECONDS", 5))
+)
+
 def get_db():
     db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    """Асинхронная сессия для async def-маршрутов"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def get_read_db():
+    """Сессия только для чтения (каталог, отчеты); см. ReadRouter"""
+    db = read_router.session()
     try:
         yield db
     finally:
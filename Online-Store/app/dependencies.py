@@ -1,24 +1,232 @@
-from fastapi import Depends, HTTPException, status
+import os
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import Depends, Request
+from sqlalchemy import event, inspect
 from sqlalchemy.orm import Session
 from database import get_db
 from models import Customer
 
-def get_current_customer(db: Session = Depends(get_db)):
-    """Получить текущего пользователя (упрощенная версия для демо)"""
-    
-    # Пытаемся найти первого пользователя в базе
-    customer = db.query(Customer).first()
-    
+
+@dataclass(frozen=True)
+class CurrentUser:
+    """Неизменяемый снимок пользователя, который можно кешировать между запросами"""
+    id: int
+    name: Optional[str]
+    email: Optional[str]
+    role: str
+    is_active: bool = True
+
+    @classmethod
+    def from_customer(cls, customer: Customer) -> "CurrentUser":
+        return cls(
+            id=customer.id,
+            name=customer.name,
+            email=customer.email,
+            role=customer.role,
+            is_active=bool(customer.is_active)
+        )
+
+
+class UserCache:
+    """TTL-кеш активных пользователей по id в памяти процесса.
+
+    Записи устаревают через ttl секунд, а при изменении роли или is_active
+    удаляются сразу (см. обработчик after_update ниже). Другие процессы
+    узнают об изменении не позже чем через ttl. Время изменения
+    запоминается на ttl секунд, чтобы не доверять данным сессии, записанным
+    до него.
+    """
+
+    def __init__(self, ttl: float = 60, max_size: int = 10_000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # id -> (CurrentUser, истекает)
+        self._changed = OrderedDict()  # id -> время изменения (time.time())
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int) -> Optional[CurrentUser]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[1] < time.monotonic():
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[0]
+
+    def put(self, user: CurrentUser):
+        with self._lock:
+            self._entries[user.id] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        now = time.time()
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._changed[user_id] = now
+            self._changed.move_to_end(user_id)
+            while self._changed and next(iter(self._changed.values())) < now - self.ttl:
+                self._changed.popitem(last=False)
+
+    def changed_since(self, user_id: int, timestamp: float) -> bool:
+        """Менялся ли пользователь после timestamp (time.time())"""
+        with self._lock:
+            return self._changed.get(user_id, 0) >= timestamp
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+user_cache = UserCache(ttl=float(os.getenv("USER_CACHE_TTL", 60)))
+
+
+@event.listens_for(Customer, "after_update")
+def _invalidate_on_change(mapper, connection, target):
+    """Сбрасывает кеш, если у пользователя изменились роль или активность"""
+    state = inspect(target)
+    if state.attrs.role.history.has_changes() or state.attrs.is_active.history.has_changes():
+        user_cache.invalidate(target.id)
+
+
+@event.listens_for(Customer, "after_delete")
+def _invalidate_on_delete(mapper, connection, target):
+    user_cache.invalidate(target.id)
+
+
+def _write_claims(request: Request, user: CurrentUser):
+    """Записывает в сессию данные пользователя и время их проверки по БД"""
+    request.session["user_id"] = user.id
+    request.session["user_role"] = user.role
+    request.session["user_name"] = user.name
+    request.session["user_email"] = user.email
+    request.session["user_checked_at"] = time.time()
+
+
+def _session_user(request: Request, user_id: int) -> Optional[CurrentUser]:
+    """Пользователь из данных сессии, если они проверены по БД не дольше ttl назад.
+
+    Подписанная сессия заменяет обращение к БД на тот же срок, что и
+    user_cache; изменение роли или активности в этом процессе делает
+    данные сессии недействительными сразу.
+    """
+    session = request.session
+    checked_at = session.get("user_checked_at")
+    if checked_at is None or "user_role" not in session:
+        return None
+    if time.time() - checked_at > user_cache.ttl or user_cache.changed_since(user_id, checked_at):
+        return None
+    return CurrentUser(id=user_id, name=session.get("user_name"), email=session.get("user_email"),
+                       role=session["user_role"])
+
+
+def start_session(request: Request, customer: Customer):
+    """Записывает в сессию данные пользователя после входа или регистрации"""
+    user = CurrentUser.from_customer(customer)
+    _write_claims(request, user)
+    user_cache.put(user)
+
+
+def _load_user(db: Session, user_id) -> Optional[CurrentUser]:
+    """Пользователь из кеша или из БД (неактивные не кешируются)"""
+    try:
+        user_id = int(user_id)
+    except (ValueError, TypeError):
+        return None
+
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+
+    customer = db.query(Customer).filter(Customer.id == user_id).first()
+    if not customer or not customer.is_active:
+        return None
+    user = CurrentUser.from_customer(customer)
+    user_cache.put(user)
+    return user
+
+
+def resolve_user(request: Request, db: Session) -> Optional[CurrentUser]:
+    """Определяет пользователя один раз за запрос.
+
+    Гость (нет user_id в сессии и куки), пользователь со свежими данными
+    в сессии и пользователь, найденный в кеше, определяются без обращения к БД.
+    """
+    if hasattr(request.state, "current_user"):
+        return request.state.current_user
+
+    user = None
+    user_id = request.session.get("user_id")
+    if user_id:
+        user = _session_user(request, user_id) if isinstance(user_id, int) else None
+        if user is None:
+            user = _load_user(db, user_id)
+            if user is not None:
+                # Обновляем данные сессии (роль могла измениться)
+                _write_claims(request, user)
+    else:
+        # Если в сессии нет, проверяем куки (для обратной совместимости)
+        user = _load_user(db, request.cookies.get("customer_id"))
+        if user is not None:
+            # Мигрируем из куки в сессию
+            _write_claims(request, user)
+
+    request.state.current_user = user
+    return user
+
+
+def get_current_user(request: Request, db: Session = Depends(get_db)) -> Optional[CurrentUser]:
+    """Текущий пользователь из сессии или куки (None для гостя)"""
+    return resolve_user(request, db)
+
+
+_demo_customer_id: Optional[int] = None
+
+
+def _demo_customer(db: Session) -> CurrentUser:
+    """Покупатель для гостя: определяется один раз, дальше берется из user_cache"""
+    global _demo_customer_id
+    user = _load_user(db, _demo_customer_id) if _demo_customer_id is not None else None
+    if user is not None:
+        return user
+
+    # Используем первого пользователя в базе
+    customer = db.query(Customer).order_by(Customer.id).first()
+
     if not customer:
         # Если пользователей нет, создаем демо-пользователя
         customer = Customer(
             email="demo@techtown.ru",
-            first_name="Демо",
-            last_name="Пользователь",
+            name="Демо Пользователь",
             role="customer"
         )
         db.add(customer)
         db.commit()
         db.refresh(customer)
-    
-    return customer
+
+    user = CurrentUser.from_customer(customer)
+    user_cache.put(user)
+    _demo_customer_id = user.id
+    return user
+
+
+def get_current_customer(request: Request, db: Session = Depends(get_db)) -> CurrentUser:
+    """Получить текущего пользователя (упрощенная версия для демо: гость оформляет
+    заказы от имени демо-покупателя)"""
+    return resolve_user(request, db) or _demo_customer(db)
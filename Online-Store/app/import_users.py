@@ -0,0 +1,33 @@
+"""
+Массовый импорт покупателей из CSV.
+
+Запуск: python import_users.py users.csv [--batch-size 1000] [--workers N]
+Колонки файла: name, email, password и необязательная role (по умолчанию customer).
+"""
+
+import argparse
+import csv
+
+from database import engine
+from migrations import migrate
+from services.user_import import import_users, print_import_report
+
+
+def read_users(path: str):
+    """Читает пользователей из CSV-файла с заголовком"""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return [row for row in csv.DictReader(f) if row.get("email") and row.get("password")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Массовый импорт пользователей")
+    parser.add_argument("path", help="CSV-файл с пользователями")
+    parser.add_argument("--batch-size", type=int, default=1000, help="строк в одной транзакции")
+    parser.add_argument("--workers", type=int, default=None, help="процессов для bcrypt (по умолчанию - число ядер)")
+    args = parser.parse_args()
+
+    migrate(engine)
+    users = read_users(args.path)
+    print(f"🔄 Импорт {len(users)} пользователей из {args.path}...")
+    stats = import_users(users, batch_size=args.batch_size, workers=args.workers)
+    print_import_report(stats)
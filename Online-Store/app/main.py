@@ -1,155 +1,85 @@
 import os
+import asyncio
+from contextlib import asynccontextmanager
 from pathlib import Path
-from fastapi import FastAPI, Request, Depends, HTTPException, Cookie, Response, Form
+from urllib.parse import urlencode
+from fastapi import FastAPI, Request, Depends, HTTPException, Cookie, Form
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse, RedirectResponse
+from sqlalchemy import func
 from sqlalchemy.orm import Session, joinedload
 import secrets
 from datetime import datetime, timedelta
 from starlette.middleware.sessions import SessionMiddleware
-import bcrypt
 import time
-from collections import defaultdict
 import re
+import logging
 
 BASE_DIR = Path(__file__).resolve().parent
 
-from database import SessionLocal, engine
+from database import SessionLocal, engine, get_read_db, read_router
 import models
-from routers import reports, admin, auth, payments, checkout
+from crud.review import update_product_rating
+from crud.pagination import keyset_paginate, clamp_page_size
+from crud.search import build_match_query, apply_search
+from migrations import migrate
+from seed import create_test_data
+from dependencies import get_current_user, user_cache
+from routers import reports, admin, auth, payments, checkout, cart
+from routers.cart import reservation_sweeper
+from routers.payments import pending_payment_sweeper
+from services.rate_limiter import create_rate_limiter
+from services.ddos_protection import UserAgentFilter, DDoSProtectionMiddleware
+from services.log_service import setup_logging, get_logger, logging_stats
+from services.password_service import password_hasher
+from services.payment_gateway import payment_gateway
+from services.job_queue import job_queue
+
+setup_logging()
+catalog_logger = get_logger("catalog")
 
 # ==================== DDoS ЗАЩИТА ====================
 
 # 1. СИСТЕМА ОГРАНИЧЕНИЯ ЧАСТОТЫ ЗАПРОСОВ
-class RateLimiter:
-    def __init__(self):
-        self.requests = defaultdict(list)
-        self.max_requests_per_minute = 60  # Максимум 60 запросов в минуту
-        self.blocked_ips = {}
-        self.block_duration = 300  # Блокировка на 5 минут
-    
-    def is_rate_limited(self, ip: str) -> bool:
-        """Проверяет, не превышен ли лимит запросов для IP"""
-        current_time = time.time()
-        
-        # Проверяем, не заблокирован ли IP
-        if ip in self.blocked_ips:
-            if current_time < self.blocked_ips[ip]:
-                return True
-            else:
-                del self.blocked_ips[ip]
-        
-        # Очищаем старые записи (старше 1 минуты)
-        self.requests[ip] = [req_time for req_time in self.requests[ip] 
-                           if current_time - req_time < 60]
-        
-        # Проверяем лимит
-        if len(self.requests[ip]) >= self.max_requests_per_minute:
-            # Блокируем IP на 5 минут
-            self.blocked_ips[ip] = current_time + self.block_duration
-            print(f"🚨 IP {ip} заблокирован за превышение лимита запросов")
-            return True
-        
-        # Добавляем текущий запрос
-        self.requests[ip].append(current_time)
-        return False
+# Реализации находятся в services/rate_limiter.py
 
 # 2. ФИЛЬТРАЦИЯ ПОЛЬЗОВАТЕЛЬСКИХ АГЕНТОВ
-class UserAgentFilter:
-    def __init__(self):
-        # Список подозрительных/нежелательных User-Agent
-        self.suspicious_agents = [
-            "bot", "crawler", "spider", "scraper", "python", "curl", 
-            "wget", "masscan", "sqlmap", "nikto", "zmeu", "acunetix",
-            "xenu", "nessus", "nmap", "megaindex", "mail.ru", "yandexbot"
-        ]
-        
-        # Список разрешенных нормальных браузеров
-        self.allowed_agents = [
-            "mozilla", "chrome", "safari", "firefox", "edge", "opera",
-            "webkit", "gecko", "applewebkit"
-        ]
-    
-    def is_suspicious_user_agent(self, user_agent: str) -> bool:
-        """Проверяет User-Agent на подозрительность"""
-        if not user_agent:
-            return True
-        
-        user_agent_lower = user_agent.lower()
-        
-        # Проверяем на наличие подозрительных строк
-        for suspicious in self.suspicious_agents:
-            if suspicious in user_agent_lower:
-                print(f"🚨 Обнаружен подозрительный User-Agent: {user_agent}")
-                return True
-        
-        # Проверяем, что это нормальный браузер
-        is_normal_browser = any(allowed in user_agent_lower 
-                              for allowed in self.allowed_agents)
-        
-        if not is_normal_browser:
-            print(f"🚨 Неизвестный User-Agent: {user_agent}")
-            return True
-        
-        return False
+# Фильтр и ASGI middleware находятся в services/ddos_protection.py
 
 # Инициализация систем защиты
-rate_limiter = RateLimiter()
+rate_limiter = create_rate_limiter()
 user_agent_filter = UserAgentFilter()
 
 # ==================== ПРИЛОЖЕНИЕ FASTAPI ====================
 
-# Создаем таблицы
-models.Base.metadata.drop_all(bind=engine)
-models.Base.metadata.create_all(bind=engine)
+# Применяем миграции схемы (если версия не изменилась - только чтение user_version)
+migrate(engine)
 
-app = FastAPI(title="E-commerce with DDoS Protection")
+# Подбираем стоимость bcrypt под этот CPU (если BCRYPT_ROUNDS не задан)
+password_hasher.calibrate()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Фоновое освобождение резервов из брошенных корзин
+    sweeper = asyncio.create_task(reservation_sweeper())
+    # Отмена платежей, зависших в pending после падения процесса
+    payment_sweeper = asyncio.create_task(pending_payment_sweeper())
+    # Воркеры очереди фоновых задач (чеки и т.п.)
+    job_queue.start()
+    yield
+    sweeper.cancel()
+    payment_sweeper.cancel()
+    await job_queue.stop()
+
+app = FastAPI(title="E-commerce with DDoS Protection", lifespan=lifespan)
 
 # Middleware для DDoS защиты
-@app.middleware("http")
-async def ddos_protection_middleware(request: Request, call_next):
-    """Middleware для защиты от DDoS атак"""
-    
-    # Получаем IP клиента
-    client_ip = request.client.host
-    
-    # Получаем User-Agent
-    user_agent = request.headers.get("user-agent", "")
-    
-    # Логируем запрос для отладки
-    print(f"📨 Запрос от {client_ip}: {request.method} {request.url.path} | User-Agent: {user_agent[:50]}...")
-    
-    # 1. Проверяем User-Agent
-    if user_agent_filter.is_suspicious_user_agent(user_agent):
-        return Response(
-            content="Доступ ограничен",
-            status_code=403,
-            headers={"X-DDoS-Protection": "Suspicious User-Agent detected"}
-        )
-    
-    # 2. Проверяем лимит запросов (только для не-статических файлов)
-    if not request.url.path.startswith("/static/"):
-        if rate_limiter.is_rate_limited(client_ip):
-            return Response(
-                content="Слишком много запросов. Попробуйте позже.",
-                status_code=429,
-                headers={
-                    "X-DDoS-Protection": "Rate limit exceeded",
-                    "Retry-After": "300"
-                }
-            )
-    
-    # Добавляем заголовки безопасности
-    response = await call_next(request)
-    
-    # Добавляем security headers
-    response.headers["X-Content-Type-Options"] = "nosniff"
-    response.headers["X-Frame-Options"] = "DENY"
-    response.headers["X-XSS-Protection"] = "1; mode=block"
-    response.headers["X-DDoS-Protection"] = "Active"
-    
-    return response
+app.add_middleware(
+    DDoSProtectionMiddleware,
+    rate_limiter=rate_limiter,
+    user_agent_filter=user_agent_filter
+)
 
 app.add_middleware(
     SessionMiddleware,
@@ -173,6 +103,7 @@ app.include_router(reports.router, prefix="/reports")
 app.include_router(admin.router, prefix="/admin")
 app.include_router(payments.router)
 app.include_router(checkout.router)
+app.include_router(cart.router)
 
 # ==================== БАЗОВЫЕ ФУНКЦИИ ====================
 
@@ -183,44 +114,20 @@ def get_db():
     finally:
         db.close()
 
-def hash_password(password: str) -> str:
-    """Хеширование пароля"""
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+# Размеры страниц по умолчанию (можно переопределить параметром page_size)
+CATALOG_PAGE_SIZE = int(os.getenv("CATALOG_PAGE_SIZE", 24))
+REVIEWS_PAGE_SIZE = int(os.getenv("REVIEWS_PAGE_SIZE", 20))
 
-def check_password(password: str, hashed_password: str) -> bool:
-    """Проверка пароля"""
-    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+def page_url(request: Request, cursor: str):
+    """Ссылка на следующую страницу с сохранением текущих фильтров"""
+    if not cursor:
+        return None
+    params = dict(request.query_params)
+    params["cursor"] = cursor
+    return f"{request.url.path}?{urlencode(params)}"
 
 # ==================== СИСТЕМА АУТЕНТИФИКАЦИИ ====================
 
-def get_current_user(request: Request, db: Session = Depends(get_db)):
-    """Получение текущего пользователя из сессии или куки"""
-    # Сначала проверяем сессию
-    user_id = request.session.get("user_id")
-    if user_id: 
-        try:
-            customer = db.query(models.Customer).filter(models.Customer.id == int(user_id)).first()
-            if customer and customer.is_active:
-                return customer
-        except (ValueError, TypeError):
-            pass
-    
-    # Если в сессии нет, проверяем куки (для обратной совместимости)
-    customer_id = request.cookies.get("customer_id")
-    if customer_id:
-        try:
-            customer = db.query(models.Customer).filter(models.Customer.id == int(customer_id)).first()
-            if customer and customer.is_active:
-                # Мигрируем из куки в сессию
-                request.session["user_id"] = customer.id
-                request.session["user_role"] = customer.role
-                request.session["user_name"] = customer.name
-                return customer
-        except (ValueError, TypeError):
-            pass
-    
-    return None
-
 def check_admin_access(current_user: models.Customer):
     """Проверка доступа для администратора"""
     if not current_user or current_user.role != "admin":
@@ -276,13 +183,14 @@ def get_security_status(
     """Статус системы защиты (только для админов)"""
     check_admin_access(current_user)
     
-    blocked_ips_count = len(rate_limiter.blocked_ips)
-    active_ips_count = len(rate_limiter.requests)
+    blocked_ips_map = rate_limiter.get_blocked_ips()
+    blocked_ips_count = len(blocked_ips_map)
+    active_ips_count = rate_limiter.active_ips_count()
     
     # Получаем статистику по заблокированным IP
     blocked_ips = []
     current_time = time.time()
-    for ip, block_until in rate_limiter.blocked_ips.items():
+    for ip, block_until in blocked_ips_map.items():
         time_remaining = max(0, int(block_until - current_time))
         if time_remaining > 0:
             blocked_ips.append({
@@ -303,16 +211,28 @@ def get_security_status(
             "total_orders": total_orders
         },
         "rate_limiting": {
+            "backend": rate_limiter.backend_name,
             "max_requests_per_minute": rate_limiter.max_requests_per_minute,
             "block_duration_seconds": rate_limiter.block_duration,
             "active_ips_count": active_ips_count,
             "currently_blocked_count": len(blocked_ips),
             "total_blocked_ips": blocked_ips_count,
-            "blocked_ips": blocked_ips
+            "blocked_ips": blocked_ips,
+            "memory": rate_limiter.memory_usage()
         },
         "user_agent_filtering": {
             "suspicious_patterns_count": len(user_agent_filter.suspicious_agents),
-            "allowed_browsers_count": len(user_agent_filter.allowed_agents)
+            "allowed_browsers_count": len(user_agent_filter.allowed_agents),
+            "verdict_cache": user_agent_filter.cache_stats()
+        },
+        "logging": logging_stats(),
+        "password_hashing": password_hasher.stats(),
+        "user_cache": user_cache.stats(),
+        "read_database": read_router.stats(),
+        "payment_gateway": payment_gateway.stats(),
+        "job_queue": {
+            **job_queue.stats(),
+            "jobs_by_status": dict(db.query(models.Job.status, func.count(models.Job.id)).group_by(models.Job.status).all())
         },
         "protection_status": "ACTIVE"
     }
@@ -345,7 +265,7 @@ def test_suspicious_agent():
 @app.get("/")
 def read_root(
     request: Request, 
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: models.Customer = Depends(get_current_user)
 ):
     categories = db.query(models.Category).all()
@@ -427,16 +347,24 @@ def reviews_page(
     current_user: models.Customer = Depends(get_current_user)
 ):
     """Страница всех отзывов"""
-    reviews = db.query(models.Review).filter(
+    query = db.query(models.Review).filter(
         models.Review.is_approved == True
     ).options(
         joinedload(models.Review.customer),
         joinedload(models.Review.product)
-    ).order_by(models.Review.created_at.desc()).all()
+    )
+    page_size = clamp_page_size(request.query_params.get("page_size"), REVIEWS_PAGE_SIZE)
+    reviews, next_cursor = keyset_paginate(
+        query,
+        [(models.Review.created_at, True), (models.Review.id, True)],
+        request.query_params.get("cursor"),
+        page_size
+    )
     
     return templates.TemplateResponse("reviews.html", {
         "request": request,
         "reviews": reviews,
+        "next_page_url": page_url(request, next_cursor),
         "current_user": current_user
     })
 
@@ -478,6 +406,8 @@ def add_review(
     )
     
     db.add(new_review)
+    if new_review.is_approved:
+        update_product_rating(db, product_id, rating, 1)
     db.commit()
     
     return RedirectResponse(url=f"/products/#product-{product_id}", status_code=303)
@@ -492,34 +422,51 @@ def cart_page(
         "current_user": current_user
     })
 
-@app.get("/api/products/{product_id}")
-def get_product(product_id: int, db: Session = Depends(get_db)):
-    product = db.query(models.Product).filter(models.Product.id == product_id).first()
-    if product is None:
-        raise HTTPException(status_code=404, detail="Product not found")
-    
-    # Получаем отзывы для товара
-    reviews = db.query(models.Review).filter(
-        models.Review.product_id == product_id,
-        models.Review.is_approved == True
-    ).all()
-    
-    # Вычисляем средний рейтинг
-    avg_rating = 0
-    if reviews:
-        avg_rating = sum(review.rating for review in reviews) / len(reviews)
-    
+# Максимум товаров в одном пакетном запросе
+PRODUCTS_BATCH_LIMIT = 100
+
+def product_to_dict(product: models.Product) -> dict:
+    """Данные товара для корзины и оформления заказа"""
     return {
         "id": product.id,
         "name": product.name,
         "price": float(product.price),
         "image_url": product.image_url,
+        "category": product.category.name if product.category else None,
         "stock_quantity": product.stock_quantity,
         "popularity": product.popularity,
-        "reviews_count": len(reviews),
-        "average_rating": round(avg_rating, 1)
+        "reviews_count": product.review_count,
+        "average_rating": round(product.average_rating, 1)
     }
 
+@app.get("/api/products")
+def get_products_batch(ids: str = "", db: Session = Depends(get_read_db)):
+    """Несколько товаров одним запросом: /api/products?ids=1,2,3 (в порядке ids, ненайденные пропускаются)"""
+    try:
+        product_ids = list(dict.fromkeys(int(value) for value in ids.split(",") if value.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids должен быть списком чисел через запятую")
+    if len(product_ids) > PRODUCTS_BATCH_LIMIT:
+        raise HTTPException(status_code=400, detail=f"Не более {PRODUCTS_BATCH_LIMIT} товаров за запрос")
+    if not product_ids:
+        return []
+    
+    products = db.query(models.Product).options(joinedload(models.Product.category)).filter(
+        models.Product.id.in_(product_ids)
+    ).all()
+    by_id = {product.id: product for product in products}
+    return [product_to_dict(by_id[product_id]) for product_id in product_ids if product_id in by_id]
+
+@app.get("/api/products/{product_id}")
+def get_product(product_id: int, db: Session = Depends(get_read_db)):
+    product = db.query(models.Product).options(joinedload(models.Product.category)).filter(
+        models.Product.id == product_id
+    ).first()
+    if product is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    return product_to_dict(product)
+
 @app.post("/api/products/{product_id}/update-popularity")
 def update_popularity(
     product_id: int,
@@ -533,11 +480,13 @@ def update_popularity(
 @app.get("/products/", response_class=HTMLResponse)
 def products_page(
     request: Request, 
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: models.Customer = Depends(get_current_user)
 ):
     try:
-        print(f"DEBUG - Все параметры запроса: {dict(request.query_params)}")
+        debug = catalog_logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            catalog_logger.debug("Все параметры запроса: %s", dict(request.query_params))
         
         categories = db.query(models.Category).all()
         
@@ -548,388 +497,110 @@ def products_page(
         max_price = request.query_params.get("max_price", "")
         sort_by = request.query_params.get("sort_by", "")
         
-        print(f"DEBUG - Получены параметры: search='{search}', category_id='{category_id}', min_price='{min_price}', max_price='{max_price}', sort_by='{sort_by}'")
+        if debug:
+            catalog_logger.debug(
+                "Получены параметры: search='%s', category_id='%s', min_price='%s', max_price='%s', sort_by='%s'",
+                search, category_id, min_price, max_price, sort_by
+            )
         
         # Базовый запрос
         query = db.query(models.Product)
         
         # Применяем фильтры
-        if search and search.strip():
-            print(f"DEBUG - Применяем фильтр поиска: '{search.strip()}'")
-            query = query.filter(models.Product.name.ilike(f"%{search.strip()}%"))
+        search_rank = None
+        match_query = build_match_query(search) if search and search.strip() else None
+        if match_query:
+            if debug:
+                catalog_logger.debug("Применяем полнотекстовый поиск: '%s'", match_query)
+            # Без явной сортировки результаты поиска упорядочиваются по релевантности
+            query, search_rank = apply_search(query, match_query, ranked=not sort_by)
         
         if category_id and category_id.strip():
             try:
                 if category_id.strip().isdigit():
                     category_int = int(category_id.strip())
-                    print(f"DEBUG - Применяем фильтр категории: {category_int}")
+                    if debug:
+                        catalog_logger.debug("Применяем фильтр категории: %s", category_int)
                     query = query.filter(models.Product.category_id == category_int)
             except ValueError as e:
-                print(f"DEBUG - Ошибка преобразования category_id: {e}")
+                catalog_logger.debug("Ошибка преобразования category_id: %s", e)
         
         if min_price and min_price.strip():
             try:
                 min_val = float(min_price.strip())
                 if min_val >= 0:
-                    print(f"DEBUG - Применяем фильтр минимальной цены: {min_val}")
+                    if debug:
+                        catalog_logger.debug("Применяем фильтр минимальной цены: %s", min_val)
                     query = query.filter(models.Product.price >= min_val)
             except ValueError as e:
-                print(f"DEBUG - Ошибка преобразования min_price: {e}")
+                catalog_logger.debug("Ошибка преобразования min_price: %s", e)
         
         if max_price and max_price.strip():
             try:
                 max_val = float(max_price.strip())
                 if max_val >= 0:
-                    print(f"DEBUG - Применяем фильтр максимальной цены: {max_val}")
+                    if debug:
+                        catalog_logger.debug("Применяем фильтр максимальной цены: %s", max_val)
                     query = query.filter(models.Product.price <= max_val)
             except ValueError as e:
-                print(f"DEBUG - Ошибка преобразования max_price: {e}")
+                catalog_logger.debug("Ошибка преобразования max_price: %s", e)
         
-        # Сортировка
+        # Сортировка (последним ключом всегда идет id - он нужен для курсора)
         if sort_by == "name":
-            print("DEBUG - Сортировка по имени")
-            query = query.order_by(models.Product.name)
+            order = [(models.Product.name, False)]
         elif sort_by == "price_asc":
-            print("DEBUG - Сортировка по цене (возрастание)")
-            query = query.order_by(models.Product.price.asc())
+            order = [(models.Product.price, False)]
         elif sort_by == "price_desc":
-            print("DEBUG - Сортировка по цене (убывание)")
-            query = query.order_by(models.Product.price.desc())
+            order = [(models.Product.price, True)]
         elif sort_by == "popularity":
-            print("DEBUG - Сортировка по популярности")
-            query = query.order_by(models.Product.popularity.desc())
+            order = [(models.Product.popularity, True)]
         elif sort_by == "rating":
-            print("DEBUG - Сортировка по рейтингу")
-            # Здесь нужна более сложная логика для сортировки по рейтингу
-            query = query.order_by(models.Product.popularity.desc())
+            order = [(models.Product.average_rating, True), (models.Product.review_count, True)]
+        elif search_rank is not None:
+            order = [(search_rank, False)]
         else:
-            print("DEBUG - Сортировка по умолчанию")
-            query = query.order_by(models.Product.id)
-        
-        products = query.all()
-        print(f"DEBUG - Найдено товаров: {len(products)}")
-        
-        # Получаем отзывы для всех товаров
-        product_reviews = {}
-        for product in products:
-            reviews = db.query(models.Review).filter(
-                models.Review.product_id == product.id,
-                models.Review.is_approved == True
-            ).all()
-            product_reviews[product.id] = reviews
+            order = []
+        # Направление id совпадает с основным ключом, чтобы индекс читался без доп. сортировки
+        order.append((models.Product.id, order[0][1] if order else False))
+        if debug:
+            catalog_logger.debug("Сортировка: '%s'", sort_by or "по умолчанию")
+        
+        # Постраничная выборка по ключу вместо загрузки всего каталога
+        page_size = clamp_page_size(request.query_params.get("page_size"), CATALOG_PAGE_SIZE)
+        products, next_cursor = keyset_paginate(
+            query, order, request.query_params.get("cursor"), page_size
+        )
+        if search_rank is not None:
+            products = [row[0] for row in products]
+        if debug:
+            catalog_logger.debug("Найдено товаров на странице: %s", len(products))
         
         return templates.TemplateResponse("products.html", {
             "request": request,
             "products": products,
             "categories": categories,
-            "product_reviews": product_reviews,
             "current_search": search,
             "current_category_id": category_id,
             "current_min_price": min_price,
             "current_max_price": max_price,
             "current_sort_by": sort_by,
+            "next_page_url": page_url(request, next_cursor),
             "current_user": current_user
         })
         
     except Exception as e:
-        import logging
-        logging.error(f"Error in products page: {e}")
-        import traceback
-        traceback.print_exc()
+        catalog_logger.exception("Error in products page: %s", e)
         return templates.TemplateResponse("error.html", {
             "request": request, 
             "error": str(e)
         })
 
-# ==================== СОЗДАНИЕ ТЕСТОВЫХ ДАННЫХ ====================
-
-def create_test_data():
-    """Создание тестовых данных для демонстрации"""
-    db = SessionLocal()
-    try:
-        # Проверяем, есть ли уже данные
-        if db.query(models.Customer).count() > 0:
-            print("✅ Данные уже существуют в базе")
-            return
-        
-        # Создаем категории
-        categories = [
-            models.Category(name="Смартфоны", description="Мобильные телефоны и аксессуары", type="product"),
-            models.Category(name="Ноутбуки", description="Портативные компьютеры", type="product"),
-            models.Category(name="Периферия", description="Компьютерные мыши и клавиатуры", type="product"),
-            models.Category(name="Умные технологии", description="Умные часы и умный дом", type="product"),
-        ]
-        
-        for category in categories:
-            db.add(category)
-        db.commit()
-        
-        print("✅ Категории созданы")
-
-        # Создаем продукты с разной популярностью
-        products = [
-            models.Product(
-                name="iPhone 15 Pro",
-                description="Смартфон Apple с процессором A17 Pro",
-                price=99990.00,
-                category_id=1,
-                stock_quantity=15,
-                image_url="/static/images/iphone.png",
-                popularity=95
-            ),
-            models.Product(
-                name="Samsung Galaxy S24",
-                description="Флагманский смартфон Samsung с AI",
-                price=79990.00,
-                category_id=1,
-                stock_quantity=12,
-                image_url="/static/images/samsung.png",
-                popularity=88
-            ),
-            models.Product(
-                name="MacBook Air M3",
-                description="Ноутбук Apple с чипом M3",
-                price=129990.00,
-                category_id=2,
-                stock_quantity=8,
-                image_url="/static/images/macbook.png",
-                popularity=92
-            ),
-            models.Product(
-                name="ASUS TUF Gaming F17",
-                description="Игровой ноутбук ASUS TUF Gaming F17 FX707ZC4-HX014 с полноразмерной клавиатурой и 17.3-дюймовым экраном ",
-                price=75999.00,
-                category_id=2,
-                stock_quantity=3,
-                image_url="/static/images/Asus.png",
-                popularity=67
-            ),
-            models.Product(
-                name="Мышь беспроводная Logitech G PRO X SUPERLIGHT 2",
-                description="Вы сможете выбрать подходящий режим работы в зависимости от решаемых задач, типа монитора и поверхности под манипулятором.",
-                price=2990.00,
-                category_id=3,
-                stock_quantity=25,
-                image_url="/static/images/logitech.png",
-                popularity=75
-            ),
-            models.Product(
-                name="Смарт-часы Apple Watch SE 2024 40mm",
-                description="Простые способы оставаться на связи.",
-                price=19900.00,
-                category_id=4,
-                stock_quantity=18,
-                image_url="/static/images/apple_watch.png",
-                popularity=82
-            ),
-            models.Product(
-                name="HUAWEI WATCH GT 6 Pro",
-                description="Смарт-часы HUAWEI WATCH GT 6 Pro — это умные носимые устройства.",
-                price=26999.00,
-                category_id=4,
-                stock_quantity=2,
-                image_url="/static/images/huawei.png",
-                popularity=89
-            ),
-            models.Product(
-                name="Беспроводные наушники Logitech G435 черный",
-                description="Радиочастотная гарнитура Logitech G435 LIGHTSPEED поддерживает два способа подключения – Bluetooth и радиоканал.",
-                price=5900.00,
-                category_id=3,
-                stock_quantity=30,
-                image_url="/static/images/ears.png",
-                popularity=68
-            ),
-        ]
-        
-        for product in products:
-            db.add(product)
-        db.commit()
-        
-        print("✅ Товары созданы")
-
-        # Создаем пользователей
-        admin_user = models.Customer(
-            name="Администратор",
-            email="admin@example.com",
-            hashed_password=hash_password("admin123"),
-            role="admin"
-        )
-        db.add(admin_user)
-        
-        customer_user = models.Customer(
-            name="Иван Покупатель",
-            email="customer@example.com",
-            hashed_password=hash_password("customer123"),
-            role="customer"
-        )
-        db.add(customer_user)
-        
-        seller_user = models.Customer(
-            name="Продавец",
-            email="seller@example.com",
-            hashed_password=hash_password("seller123"),
-            role="seller"
-        )
-        db.add(seller_user)
-
-        manager_user = models.Customer(
-            name="Менеджер",
-            email="manager@example.com",
-            hashed_password=hash_password("manager123"),
-            role="manager"
-        )
-        db.add(manager_user)
-
-        # Создаем еще несколько тестовых пользователей для отзывов
-        test_customers = [
-            models.Customer(
-                name="Анна Смирнова",
-                email="anna@example.com",
-                hashed_password=hash_password("password123"),
-                role="customer"
-            ),
-            models.Customer(
-                name="Петр Иванов",
-                email="petr@example.com",
-                hashed_password=hash_password("password123"),
-                role="customer"
-            ),
-            models.Customer(
-                name="Мария Козлова",
-                email="maria@example.com",
-                hashed_password=hash_password("password123"),
-                role="customer"
-            ),
-            models.Customer(
-                name="Сергей Петров",
-                email="sergey@example.com",
-                hashed_password=hash_password("password123"),
-                role="customer"
-            )
-        ]
-        
-        for customer in test_customers:
-            db.add(customer)
-        
-        db.commit()
-        
-        print("✅ Пользователи созданы")
-
-        # Создаем тестовые отзывы
-        reviews = [
-            models.Review(
-                customer_id=customer_user.id,
-                product_id=1,  # iPhone 15 Pro
-                rating=5,
-                title="Отличный смартфон!",
-                comment="Пользуюсь уже месяц, все работает идеально. Камера просто супер!",
-                is_approved=True
-            ),
-            models.Review(
-                customer_id=test_customers[0].id,
-                product_id=1,  # iPhone 15 Pro
-                rating=4,
-                title="Хороший телефон, но дорогой",
-                comment="Качество на высоте, но цена завышена. Батарея держит хорошо.",
-                is_approved=True
-            ),
-            models.Review(
-                customer_id=test_customers[1].id,
-                product_id=3,  # MacBook Air M3
-                rating=5,
-                title="Лучший ноутбук для работы",
-                comment="Работаю с ним уже 2 месяца - ни разу не завис. Очень доволен покупкой!",
-                is_approved=True
-            ),
-            models.Review(
-                customer_id=test_customers[2].id,
-                product_id=6,  # Apple Watch SE
-                rating=4,
-                title="Удобные и функциональные часы",
-                comment="Отслеживание активности очень точное. Дизайн стильный.",
-                is_approved=True
-            ),
-            models.Review(
-                customer_id=test_customers[3].id,
-                product_id=5,  # Наушники Logitech
-                rating=5,
-                title="Отличный звук!",
-                comment="Звук чистый, бас глубокий. Пользуюсь для игр и музыки - все отлично.",
-                is_approved=True
-            ),
-            models.Review(
-                customer_id=customer_user.id,
-                product_id=2,  # Samsung Galaxy S24
-                rating=4,
-                title="Хорошая альтернатива Apple",
-                comment="AI функции действительно полезны. Камера отличная.",
-                is_approved=True
-            )
-        ]
-        
-        for review in reviews:
-            db.add(review)
-        
-        db.commit()
-        print("✅ Отзывы созданы")
-        
-        print("\n🎉 Тестовые данные успешно добавлены!")
-        print("\n👥 Пользователи:")
-        print("📧 Админ - Логин: admin@example.com")
-        print("🔑 Админ - Пароль: admin123")
-        print("👤 Админ - Роль: admin")
-        print("---")
-        print("📧 Покупатель - Логин: customer@example.com")
-        print("🔑 Покупатель - Пароль: customer123")
-        print("👤 Покупатель - Роль: customer")
-        print("---")
-        print("📧 Продавец - Логин: seller@example.com")
-        print("🔑 Продавец - Пароль: seller123")
-        print("👤 Продавец - Роль: seller")
-        print("---")
-        print("📧 Менеджер - Логин: manager@example.com")
-        print("🔑 Менеджер - Пароль: manager123")
-        print("👤 Менеджер - Роль: manager")
-        
-        print(f"\n📊 Статистика:")
-        print(f"📦 Категории: {len(categories)}")
-        print(f"🛍️ Товары: {len(products)}")
-        print(f"👥 Пользователи: {len(test_customers) + 4}")
-        print(f"⭐ Отзывы: {len(reviews)}")
-        
-        print(f"\n🏆 Рейтинг популярности товаров:")
-        sorted_products = sorted(products, key=lambda x: x.popularity, reverse=True)
-        for i, product in enumerate(sorted_products, 1):
-            print(f"  {i}. {product.name}: {product.popularity} баллов")
-        
-        print(f"\n🔐 Права доступа:")
-        print("  • Админ: полный доступ ко всему")
-        print("  • Продавец: админ-панель, товары, корзина")
-        print("  • Менеджер: отчеты, товары, корзина")
-        print("  • Покупатель: товары, корзина, отзывы")
-        
-        print(f"\n🛡️  Система защиты от DDoS активна:")
-        print("  • Ограничение запросов: 60/минуту")
-        print("  • Фильтрация User-Agent: активна")
-        print("  • Мониторинг: /admin/security-status")
-        print("  • Тест защиты: /test/ddos-simulation")
-        print("  • Тест User-Agent: /test/suspicious-agent")
-        
-    except Exception as e:
-        print(f"❌ Ошибка создания тестовых данных: {e}")
-        db.rollback()
-        import traceback
-        traceback.print_exc()
-    finally:
-        db.close()
-
 # ==================== ЗАПУСК ПРИЛОЖЕНИЯ ====================
 
 if __name__ == "__main__":
     import uvicorn
     
-    # Создаем тестовые данные
+    # Создаем тестовые данные (при импорте через uvicorn - командой python seed.py)
     create_test_data()
     
     print("\n🚀 Запуск приложения с DDoS защитой...")
@@ -938,7 +609,4 @@ if __name__ == "__main__":
     print("   • /test/suspicious-agent - тест фильтра User-Agent")
     print("   • /admin/security-status - мониторинг защиты (только для админов)")
     
-    uvicorn.run(app, host="0.0.0.0", port=8000)
-else:
-    # Создаем тестовые данные при импорте
-    create_test_data()
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
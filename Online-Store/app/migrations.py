@@ -0,0 +1,124 @@
+"""
+Версионирование схемы базы данных.
+
+Текущая версия хранится в PRAGMA user_version. При старте приложения
+читается только она; миграции выполняются, лишь если версия устарела.
+"""
+
+from sqlalchemy import text, inspect
+
+import models
+from crud.search import ensure_search_index
+from services.log_service import get_logger
+
+logger = get_logger("migrations")
+
+
+def _create_tables(conn):
+    """Базовая схема: недостающие таблицы моделей"""
+    models.Base.metadata.create_all(bind=conn)
+
+
+def _add_product_rating_columns(conn):
+    """Денормализованные агрегаты рейтинга в products"""
+    existing = {column["name"] for column in inspect(conn).get_columns("products")}
+    for name, ddl in [
+        ("review_count", "INTEGER NOT NULL DEFAULT 0"),
+        ("rating_sum", "INTEGER NOT NULL DEFAULT 0"),
+        ("average_rating", "FLOAT NOT NULL DEFAULT 0"),
+    ]:
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE products ADD COLUMN {name} {ddl}"))
+
+    conn.execute(text("""
+        UPDATE products SET
+            review_count = (SELECT COUNT(*) FROM reviews
+                            WHERE reviews.product_id = products.id AND reviews.is_approved = 1),
+            rating_sum = (SELECT COALESCE(SUM(rating), 0) FROM reviews
+                          WHERE reviews.product_id = products.id AND reviews.is_approved = 1)
+    """))
+    conn.execute(text("""
+        UPDATE products SET average_rating =
+            CASE WHEN review_count > 0 THEN rating_sum * 1.0 / review_count ELSE 0 END
+    """))
+
+
+def _create_indexes(conn):
+    """Составные и частичные индексы"""
+    models.create_missing_indexes(conn)
+
+
+def _create_search_index(conn):
+    """Полнотекстовый индекс товаров (FTS5)"""
+    ensure_search_index(conn)
+
+
+def _add_cart_reservations(conn):
+    """Срок резерва товара в корзине"""
+    existing = {column["name"] for column in inspect(conn).get_columns("cart_items")}
+    if "reserved_until" not in existing:
+        conn.execute(text("ALTER TABLE cart_items ADD COLUMN reserved_until DATETIME"))
+    models.create_missing_indexes(conn)
+
+
+def _create_idempotency_keys(conn):
+    """Таблица ключей идемпотентности платежей"""
+    models.IdempotencyKey.__table__.create(bind=conn, checkfirst=True)
+
+
+def _create_jobs(conn):
+    """Очередь фоновых задач"""
+    models.Job.__table__.create(bind=conn, checkfirst=True)
+
+
+# Новые миграции добавляются только в конец списка
+MIGRATIONS = [
+    (1, "Базовая схема", _create_tables),
+    (2, "Агрегаты рейтинга товаров", _add_product_rating_columns),
+    (3, "Составные индексы", _create_indexes),
+    (4, "Полнотекстовый поиск", _create_search_index),
+    (5, "Резервирование товаров в корзине", _add_cart_reservations),
+    (6, "Ключи идемпотентности платежей", _create_idempotency_keys),
+    (7, "Очередь фоновых задач", _create_jobs),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn) -> int:
+    return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def migrate(engine) -> int:
+    """Применяет недостающие миграции и возвращает версию схемы.
+
+    Все миграции выполняются в одной транзакции BEGIN IMMEDIATE, поэтому
+    при одновременном старте нескольких воркеров схему обновляет только
+    первый, а остальные дожидаются его и видят уже новую версию.
+    """
+    with engine.connect() as conn:
+        if get_schema_version(conn) >= SCHEMA_VERSION:
+            return SCHEMA_VERSION
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            version = get_schema_version(conn)
+            for migration_version, description, apply in MIGRATIONS:
+                if migration_version <= version:
+                    continue
+                logger.info("Миграция %s: %s", migration_version, description)
+                apply(conn)
+                version = migration_version
+            conn.exec_driver_sql(f"PRAGMA user_version = {version}")
+            conn.exec_driver_sql("COMMIT")
+        except Exception:
+            conn.exec_driver_sql("ROLLBACK")
+            raise
+    return version
+
+
+if __name__ == "__main__":
+    from database import engine
+
+    print(f"✅ Версия схемы: {migrate(engine)}")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Float, DateTime, Text, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, Float, DateTime, Text, Boolean, Index, inspect
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from sqlalchemy.ext.declarative import declarative_base
@@ -16,7 +16,7 @@ class Payment(Base):
     customer_id = Column(Integer, nullable=False, index=True)
     amount = Column(Float, nullable=False)
     currency = Column(String(3), default="RUB")
-    status = Column(String(20), default="pending")  # pending, completed, failed, demo_paid
+    status = Column(String(20), default="pending")  # pending, completed, failed, demo_paid, needs_reconciliation
     payment_method = Column(String(50), default="demo_card")  # demo_card, demo_sbp
     description = Column(Text)
     
@@ -28,6 +28,37 @@ class Payment(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+class IdempotencyKey(Base):
+    """Ключ идемпотентности запроса создания платежа (заголовок Idempotency-Key)"""
+    __tablename__ = "idempotency_keys"
+
+    customer_id = Column(Integer, primary_key=True)
+    key = Column(String(255), primary_key=True)
+    request_hash = Column(String(64), nullable=False)  # sha256 тела запроса
+    response_json = Column(Text)  # Сохраненный PaymentResponse; NULL - запрос еще выполняется
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+class Job(Base):
+    """Фоновая задача в очереди (см. services/job_queue.py)"""
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(50), nullable=False)
+    payload_json = Column(Text, nullable=False)
+    status = Column(String(20), nullable=False, default="pending")  # pending, running, done, dead
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_after = Column(DateTime, nullable=False, default=datetime.utcnow)  # Не раньше этого момента (задержка повтора)
+    locked_until = Column(DateTime)  # Аренда выполняющей задачи; после нее задачу может забрать другой воркер
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime)
+
+    __table_args__ = (
+        # Выбор следующей готовой задачи
+        Index("ix_jobs_status_run_after", "status", "run_after"),
+    )
+
 class OrderStatus(enum.Enum):
     PENDING = "pending"
     CONFIRMED = "confirmed"
@@ -55,12 +86,25 @@ class Product(Base):
     stock_quantity = Column(Integer, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
     popularity = Column(Integer, default=0, index=True)
+    # Денормализованные агрегаты по одобренным отзывам (см. crud/review.py)
+    review_count = Column(Integer, default=0, nullable=False)
+    rating_sum = Column(Integer, default=0, nullable=False)
+    average_rating = Column(Float, default=0.0, nullable=False)
 
     category = relationship("Category", back_populates="products")
     order_items = relationship("OrderItem", back_populates="product")
     cart_items = relationship("CartItem", back_populates="product")
     reviews = relationship("Review", back_populates="product")  # Добавлено
 
+    __table_args__ = (
+        # Фильтр каталога по категории и диапазону цен, сортировка по цене
+        Index("ix_products_category_price", "category_id", "price"),
+        # Сортировка каталога по рейтингу
+        Index("ix_products_rating", "average_rating", "review_count"),
+        # Только товары в наличии (частичный индекс)
+        Index("ix_products_in_stock_category_price", "category_id", "price", sqlite_where=stock_quantity > 0),
+    )
+
 class Customer(Base):
     __tablename__ = "customers"
     id = Column(Integer, primary_key=True, index=True)
@@ -92,6 +136,17 @@ class Review(Base):
     customer = relationship("Customer", backref="reviews_backref")
     product = relationship("Product", backref="reviews_backref")
 
+    __table_args__ = (
+        # Агрегаты одобренных отзывов по товару
+        Index("ix_reviews_product_approved", "product_id", "is_approved"),
+        # Лента одобренных отзывов от новых к старым
+        Index("ix_reviews_approved_created", "is_approved", "created_at", "id"),
+        # Отчеты за период
+        Index("ix_reviews_created_at", "created_at"),
+        # Проверка повторного отзыва покупателя на товар
+        Index("ix_reviews_customer_product", "customer_id", "product_id"),
+    )
+
 class Order(Base):
     __tablename__ = "orders"
     id = Column(Integer, primary_key=True, index=True)
@@ -123,6 +178,27 @@ class CartItem(Base):
     product_id = Column(Integer, ForeignKey("products.id"))
     quantity = Column(Integer, default=1)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Товар списан со склада до этого момента; после - резерв возвращается
+    reserved_until = Column(DateTime, index=True)
     
     customer = relationship("Customer", back_populates="cart_items")
-    product = relationship("Product", back_populates="cart_items")
\ No newline at end of file
+    product = relationship("Product", back_populates="cart_items")
+
+    __table_args__ = (
+        # Одна строка корзины на пару покупатель-товар
+        Index("ix_cart_items_customer_product", "customer_id", "product_id", unique=True),
+    )
+
+def create_missing_indexes(bind):
+    """Создает индексы моделей, которых нет в уже существующей базе.
+
+    create_all пропускает существующие таблицы целиком, поэтому новые
+    индексы для них создаются отдельно (CREATE INDEX IF NOT EXISTS).
+    Индексы по колонкам, которые добавит более поздняя миграция, пропускаются.
+    """
+    inspector = inspect(bind)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for index in table.indexes:
+            if all(column.name in existing for column in index.columns):
+                index.create(bind=bind, checkfirst=True)
\ No newline at end of file
@@ -1,11 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.responses import HTMLResponse, RedirectResponse
-from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
 import models
 from pathlib import Path
 from fastapi.templating import Jinja2Templates
-import bcrypt
+from services.bounded_executor import ExecutorOverloaded
+from services.password_service import password_hasher
+from dependencies import get_current_user, start_session, CurrentUser
 
 router = APIRouter()
 
@@ -13,21 +16,19 @@ router = APIRouter()
 BASE_DIR = Path(__file__).resolve().parent.parent
 templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
 
-def check_password(password: str, hashed_password: str) -> bool:
-    """Проверка пароля"""
-    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+async def run_password_task(task):
+    """Ожидает операцию bcrypt из ограниченного пула, при перегрузке отвечает 503"""
+    try:
+        return await task
+    except ExecutorOverloaded:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Сервер перегружен, попробуйте позже",
+            headers={"Retry-After": "1"}
+        )
 
 # Зависимости для проверки ролей
-def get_current_user(request: Request, db: Session = Depends(get_db)):
-    """Получение текущего пользователя из сессии"""
-    user_id = request.session.get("user_id")
-    if user_id:
-        user = db.query(models.Customer).filter(models.Customer.id == user_id).first()
-        if user and user.is_active:
-            return user
-    return None  # Гость
-
-def require_auth(current_user: models.Customer = Depends(get_current_user)):
+def require_auth(current_user: CurrentUser = Depends(get_current_user)):
     """Требует аутентификации"""
     if not current_user:
         raise HTTPException(
@@ -36,7 +37,7 @@ def require_auth(current_user: models.Customer = Depends(get_current_user)):
         )
     return current_user
 
-def require_admin(current_user: models.Customer = Depends(require_auth)):
+def require_admin(current_user: CurrentUser = Depends(require_auth)):
     """Требует роль администратора"""
     if current_user.role != "admin":
         raise HTTPException(
@@ -54,16 +55,18 @@ def login_page(request: Request):
 @router.post("/login")
 async def login(
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Обработка входа"""
     form_data = await request.form()
     email = form_data.get("email")
     password = form_data.get("password")
     
-    user = db.query(models.Customer).filter(models.Customer.email == email).first()
+    user = (await db.execute(
+        select(models.Customer).where(models.Customer.email == email)
+    )).scalars().first()
     
-    if not user or not check_password(password, user.hashed_password):
+    if not user or not await run_password_task(password_hasher.verify_async(password, user.hashed_password)):
         return templates.TemplateResponse("login.html", {
             "request": request,
             "error": "Неверный email или пароль"
@@ -75,10 +78,14 @@ async def login(
             "error": "Аккаунт деактивирован"
         })
     
+    # Пароль верный - пересчитываем хеш, если он создан с другой стоимостью bcrypt
+    if password_hasher.needs_rehash(user.hashed_password):
+        user.hashed_password = await run_password_task(password_hasher.hash_async(password))
+        await db.commit()
+        password_hasher.rehashed += 1
+    
     # Сохраняем пользователя в сессии
-    request.session["user_id"] = user.id
-    request.session["user_role"] = user.role
-    request.session["user_name"] = user.name
+    start_session(request, user)
     
     return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
 
@@ -90,7 +97,7 @@ def register_page(request: Request):
 @router.post("/register")
 async def register(
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Обработка регистрации"""
     form_data = await request.form()
@@ -99,7 +106,9 @@ async def register(
     name = form_data.get("name")
     
     # Проверяем, существует ли пользователь
-    existing_user = db.query(models.Customer).filter(models.Customer.email == email).first()
+    existing_user = (await db.execute(
+        select(models.Customer.id).where(models.Customer.email == email)
+    )).first()
     if existing_user:
         return templates.TemplateResponse("register.html", {
             "request": request,
@@ -112,16 +121,14 @@ async def register(
         name=name,
         role="customer"  # По умолчанию покупатель
     )
-    new_user.hashed_password = hash_password(password)
+    new_user.hashed_password = await run_password_task(password_hasher.hash_async(password))
     
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     
     # Автоматически входим после регистрации
-    request.session["user_id"] = new_user.id
-    request.session["user_role"] = new_user.role
-    request.session["user_name"] = new_user.name
+    start_session(request, new_user)
     
     return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
 
@@ -129,9 +136,4 @@ async def register(
 def logout(request: Request):
     """Выход из системы"""
     request.session.clear()
-    return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
-
-# Вспомогательные функции для работы с паролями
-def hash_password(password: str) -> str:
-    """Хеширование пароля"""
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
\ No newline at end of file
+    return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
\ No newline at end of file
@@ -0,0 +1,121 @@
+import asyncio
+import os
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from database import get_db, SessionLocal
+import models
+from crud.cart import (
+    RESERVATION_TTL, InsufficientStock, CartConflict, get_cart, set_cart_quantity,
+    extend_reservations, release_expired_reservations
+)
+from dependencies import CurrentUser
+from routers.auth import require_auth
+from schemas.cart import CartItemAdd, CartItemUpdate, CartResponse
+from services.log_service import get_logger
+
+router = APIRouter(prefix="/api/cart", tags=["cart"])
+
+logger = get_logger("cart")
+
+# Как часто фоновая задача возвращает на склад товары из брошенных корзин
+SWEEP_INTERVAL = int(os.getenv("CART_SWEEP_INTERVAL", 60))
+
+def cart_response(db: Session, customer_id: int) -> CartResponse:
+    items = get_cart(db, customer_id)
+    # Цену могли убрать у товара, уже лежащего в корзине: он показывается без цены и не входит в сумму
+    priced = [item for item in items if item.product.price is not None]
+    return CartResponse(
+        items=[{
+            "product_id": item.product_id,
+            "name": item.product.name,
+            "price": item.product.price,
+            "quantity": item.quantity,
+            "image_url": item.product.image_url,
+            "reserved_until": item.reserved_until
+        } for item in items],
+        total_quantity=sum(item.quantity for item in items),
+        total_amount=sum(float(item.product.price) * item.quantity for item in priced),
+        reservation_ttl_seconds=RESERVATION_TTL
+    )
+
+def change_quantity(db: Session, customer_id: int, product_id: int, quantity: int, relative: bool = False):
+    """Меняет количество товара и резерв в одной транзакции"""
+    try:
+        release_expired_reservations(db, customer_id)
+        set_cart_quantity(db, customer_id, product_id, quantity, relative)
+        extend_reservations(db, customer_id)
+        db.commit()
+    except InsufficientStock:
+        db.rollback()
+        product = db.query(models.Product.price).filter(models.Product.id == product_id).first()
+        if product is None:
+            raise HTTPException(status_code=404, detail="Товар не найден")
+        if product.price is None:
+            raise HTTPException(status_code=409, detail="Товар недоступен для заказа: не указана цена")
+        raise HTTPException(status_code=409, detail="Недостаточно товара на складе")
+    except (CartConflict, IntegrityError):
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Корзина изменена другим запросом, повторите попытку")
+
+@router.get("", response_model=CartResponse)
+def read_cart(db: Session = Depends(get_db), current_user: CurrentUser = Depends(require_auth)):
+    """Корзина текущего пользователя; обращение продлевает резерв товаров"""
+    release_expired_reservations(db, current_user.id)
+    extend_reservations(db, current_user.id)
+    db.commit()
+    return cart_response(db, current_user.id)
+
+@router.post("/items", response_model=CartResponse)
+def add_cart_item(
+    data: CartItemAdd,
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(require_auth)
+):
+    """Добавляет товар в корзину и резервирует его на складе"""
+    change_quantity(db, current_user.id, data.product_id, data.quantity, relative=True)
+    return cart_response(db, current_user.id)
+
+@router.put("/items/{product_id}", response_model=CartResponse)
+def update_cart_item(
+    product_id: int,
+    data: CartItemUpdate,
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(require_auth)
+):
+    """Устанавливает количество товара (0 - удалить), резерв меняется на разницу"""
+    change_quantity(db, current_user.id, product_id, data.quantity)
+    return cart_response(db, current_user.id)
+
+@router.delete("/items/{product_id}", response_model=CartResponse)
+def delete_cart_item(
+    product_id: int,
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(require_auth)
+):
+    """Удаляет товар из корзины и возвращает его на склад"""
+    change_quantity(db, current_user.id, product_id, 0)
+    return cart_response(db, current_user.id)
+
+def release_abandoned_reservations() -> int:
+    """Возвращает на склад товары из всех просроченных корзин"""
+    db = SessionLocal()
+    try:
+        released = release_expired_reservations(db)
+        db.commit()
+        return released
+    finally:
+        db.close()
+
+async def reservation_sweeper(interval: int = SWEEP_INTERVAL):
+    """Фоновая задача: периодически освобождает просроченные резервы"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            released = await run_in_threadpool(release_abandoned_reservations)
+            if released:
+                logger.info("Освобождено резервов из брошенных корзин: %s", released)
+        except Exception:
+            logger.exception("Ошибка при освобождении резервов")
\ No newline at end of file
@@ -1,13 +1,10 @@
 from fastapi import APIRouter, Depends, Request, HTTPException
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
 from pathlib import Path
 import json
 
-from database import get_db
-from models import Customer
-from dependencies import get_current_customer
+from dependencies import get_current_customer, CurrentUser
 
 router = APIRouter()
 
@@ -18,8 +15,7 @@ templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
 @router.get("/checkout/", response_class=HTMLResponse)
 async def checkout_page(
     request: Request,
-    db: Session = Depends(get_db),
-    current_customer: Customer = Depends(get_current_customer)
+    current_customer: CurrentUser = Depends(get_current_customer)
 ):
     """Страница оформления заказа"""
     
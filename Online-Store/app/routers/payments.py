@@ -1,70 +1,171 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, BackgroundTasks
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
 from fastapi.responses import HTMLResponse
-from sqlalchemy.orm import Session
-from typing import List
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+import os
 import json
+import asyncio
 
-from database import get_db
-from models import Customer, Payment
+from database import get_async_db, AsyncSessionLocal
+from models import Payment
 from schemas.payment import PaymentCreate, PaymentResponse
-from crud.payment import create_payment, get_payment, update_payment_status, get_payments_by_customer
-from services.demo_payment import DemoPaymentService
+from crud.payment import get_payment, get_payments_by_customer
+from crud.pagination import clamp_page_size
+from crud.idempotency import claim_key, forget_expired_keys, release_key, request_hash
+from services.payment_gateway import payment_gateway, PaymentProviderError
+from services.checkout_service import (
+    PENDING_PAYMENT_TIMEOUT, place_order, settle_payment, hold_for_reconciliation, release_stale_payments,
+    CheckoutError, ProductNotFound
+)
+from services.log_service import get_logger
 from services.email_service import EmailService
-from dependencies import get_current_customer
+from services.job_queue import job_queue
+from dependencies import get_current_customer, CurrentUser
 
 router = APIRouter(prefix="/payments", tags=["payments"])
+logger = get_logger("payments")
 
-payment_service = DemoPaymentService()
 email_service = EmailService()
 
+# Как часто проверять платежи, зависшие в pending
+PENDING_SWEEP_INTERVAL = int(os.getenv("PENDING_PAYMENT_SWEEP_INTERVAL", 60))
+# Незавершенный ключ занят, пока его платеж может висеть в pending: ключ
+# освобождается не раньше, чем зависший платеж отменит pending_payment_sweeper,
+# поэтому повтор после сбоя не создаст второй заказ рядом с первым
+IDEMPOTENCY_LOCK_TIMEOUT = PENDING_PAYMENT_TIMEOUT + PENDING_SWEEP_INTERVAL
+# Сколько раз пытаться сохранить ответ провайдера, прежде чем отдать платеж на сверку
+SETTLE_ATTEMPTS = int(os.getenv("PAYMENT_SETTLE_ATTEMPTS", 3))
+
+async def claim_idempotency_key(db: AsyncSession, customer_id: int, key: str,
+                                 fingerprint: str) -> Optional[PaymentResponse]:
+    """Занимает ключ идемпотентности или возвращает сохраненный ответ.
+
+    None - ключ свободен, запрос выполняется впервые. Ответ сохраняется
+    только после ответа провайдера, поэтому повтор, пришедший пока первый
+    запрос выполняется, получает 409 и должен повторить попытку позже.
+    """
+    stored = await claim_key(db, customer_id, key, fingerprint, IDEMPOTENCY_LOCK_TIMEOUT)
+    if stored is None:
+        return None
+    if stored.request_hash != fingerprint:
+        raise HTTPException(status_code=422, detail="Ключ идемпотентности уже использован с другими данными")
+    if stored.response_json is not None:
+        return PaymentResponse.model_validate_json(stored.response_json)
+    raise HTTPException(
+        status_code=409,
+        detail="Запрос с этим ключом еще выполняется",
+        headers={"Retry-After": "1"}
+    )
+
+async def settle_with_retries(db: AsyncSession, order, db_payment: Payment, succeeded: bool,
+                              idempotency_key: Optional[str]) -> None:
+    """Сохраняет ответ провайдера, повторяя при сбоях базы.
+
+    Оплаченный заказ нельзя оставить в pending: его отменила бы
+    pending_payment_sweeper. Если сохранить успех так и не удалось, платеж
+    помечается для ручной сверки (hold_for_reconciliation).
+    """
+    payment_id, customer_id = db_payment.id, db_payment.customer_id
+    for attempt in range(SETTLE_ATTEMPTS):
+        try:
+            if attempt:
+                # Транзакция откачена, объекты нужно перечитать
+                await asyncio.sleep(0.1 * 2 ** (attempt - 1))
+                await db.refresh(order)
+                await db.refresh(db_payment)
+            if succeeded:
+                # Чек ставится в очередь задач и сохраняется тем же commit, что и оплата
+                await job_queue.enqueue(db, "send_receipt", {"payment_id": payment_id})
+            await settle_payment(db, order, db_payment, succeeded, idempotency_key)
+            return
+        except CheckoutError:
+            raise
+        except Exception:
+            await db.rollback()
+            logger.exception("Платеж %s: не удалось сохранить ответ провайдера (попытка %s)",
+                             payment_id, attempt + 1)
+
+    if succeeded:
+        try:
+            if await hold_for_reconciliation(db, payment_id, customer_id, idempotency_key):
+                logger.error("Платеж %s списан, но не подтвержден: передан на сверку", payment_id)
+        except Exception:
+            logger.critical("Платеж %s списан, но не сохранен и не передан на сверку", payment_id, exc_info=True)
+    raise HTTPException(status_code=500, detail="Не удалось сохранить результат оплаты, заказ будет проверен")
+
 @router.post("/create", response_model=PaymentResponse)
 async def create_payment_route(
     payment_data: PaymentCreate,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
-    current_customer: Customer = Depends(get_current_customer)
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, min_length=1, max_length=255),
+    db: AsyncSession = Depends(get_async_db),
+    current_customer: CurrentUser = Depends(get_current_customer)
 ):
-    """Создание демо-платежа с немедленной отправкой чека"""
+    """Оформление заказа с демо-оплатой и отправкой чека.
+
+    Заказ, позиции, платеж и списание со склада сохраняются одной
+    транзакцией (см. services/checkout_service.py). Повтор запроса с тем же
+    заголовком Idempotency-Key возвращает сохраненный ответ, не создавая
+    второй платеж и не отправляя второй чек. Затем платеж проводится через
+    payment_gateway; при отказе заказ отменяется и возвращается 402.
+    """
     
+    if idempotency_key:
+        stored = await claim_idempotency_key(db, current_customer.id, idempotency_key, request_hash(payment_data))
+        if stored is not None:
+            response.headers["Idempotent-Replayed"] = "true"
+            return stored
+
     try:
-        print("=== PAYMENT CREATE CALLED ===")
-        print(f"Payment data: {payment_data}")
+        logger.debug("Оформление заказа покупателя %s: позиций %s", current_customer.id, len(payment_data.items))
 
-        # Создаем запись платежа в БД
-        db_payment = create_payment(db, payment_data, current_customer.id)
-    
-        # Сразу помечаем платеж как оплаченный
-        update_payment_status(db, db_payment.id, "demo_paid")
-    
-        # Отправляем чек на email в фоне
-        background_tasks.add_task(send_receipt_email, db, db_payment.id)
-    
-        response_data = PaymentResponse(
-            id=db_payment.id,
-            order_id=db_payment.order_id,
-            amount=db_payment.amount,
-            status="demo_paid",
-            payment_url=f"/payments/success/{db_payment.id}",
-            customer_email=db_payment.customer_email,
-            payment_method=db_payment.payment_method
-        )
-
-        print(f"Payment created: {response_data}")
-        return response_data
-    
+        # Цены берутся из каталога; платеж ждет ответа провайдера
+        order, db_payment = await place_order(db, payment_data, current_customer.id,
+                                              status="pending", idempotency_key=idempotency_key)
     except Exception as e:
-        print(f"Error in create_payment_route: {e}")
+        if idempotency_key:
+            # Заказ не создан - ключ можно использовать для повторной попытки
+            await release_key(db, current_customer.id, idempotency_key)
+        if isinstance(e, ProductNotFound):
+            raise HTTPException(status_code=404, detail=str(e))
+        if isinstance(e, CheckoutError):
+            raise HTTPException(status_code=409, detail=str(e))
+        logger.exception("Ошибка оформления заказа покупателя %s", current_customer.id)
         raise HTTPException(status_code=500, detail=str(e))
 
+    # Провайдер вызывается вне транзакции заказа, чтобы не держать блокировку записи
+    # на время сетевого запроса; таймауты и повторы ограничены шлюзом
+    try:
+        await payment_gateway.charge(db_payment.id, db_payment.amount)
+        payment_error = None
+    except PaymentProviderError as e:
+        payment_error = e
+    try:
+        await settle_with_retries(db, order, db_payment, payment_error is None, idempotency_key)
+    except CheckoutError as e:
+        # Платеж успели отменить как зависший (release_stale_payments)
+        raise HTTPException(status_code=409, detail=str(e))
+
+    if payment_error is not None:
+        logger.warning("Платеж %s не проведен: %s", db_payment.id, payment_error)
+        raise HTTPException(status_code=402, detail=str(payment_error))
+
+    job_queue.notify()
+
+    response_data = PaymentResponse.from_payment(db_payment)
+    logger.info("Платеж %s проведен: заказ %s, %s ₽", response_data.id, response_data.order_id, response_data.amount)
+    return response_data
+
 @router.get("/success/{payment_id}", response_class=HTMLResponse)
 async def payment_success(
     payment_id: int,
-    db: Session = Depends(get_db),
-    current_customer: Customer = Depends(get_current_customer)
+    db: AsyncSession = Depends(get_async_db),
+    current_customer: CurrentUser = Depends(get_current_customer)
 ):
     """Страница успешной оплаты"""
     
-    payment = get_payment(db, payment_id)
+    payment = await get_payment(db, payment_id)
     if not payment or payment.customer_id != current_customer.id:
         raise HTTPException(status_code=404, detail="Платеж не найден")
     
@@ -138,41 +239,56 @@ async def payment_success(
     
     return HTMLResponse(content=html_content)
 
-async def send_receipt_email(db: Session, payment_id: int):
-    """Отправка чека на email"""
-    try:
-        payment = get_payment(db, payment_id)
-        if not payment:
-            print(f"Payment {payment_id} not found for receipt")
-            return
-        
-        # Подготавливаем данные для чека
-        receipt_data = {
-            "payment_id": payment.id,
-            "payment_date": payment.created_at.strftime("%d.%m.%Y %H:%M"),
-            "order_id": payment.order_id,
-            "customer_email": payment.customer_email,
-            "customer_phone": payment.customer_phone,
-            "payment_method": payment.payment_method,
-            "items": json.loads(payment.items_json),
-            "total_amount": payment.amount
-        }
-        
-        print(f"Sending receipt to {payment.customer_email}")
-        # Отправляем чек
-        email_service.send_receipt(payment.customer_email, receipt_data)
-    except Exception as e:
-        print(f"Error sending receipt: {e}")
+@job_queue.handler("send_receipt")
+async def send_receipt_email(payload: dict):
+    """Отправка чека на email (задача очереди; ошибка приводит к повтору)"""
+    payment_id = payload["payment_id"]
+    async with AsyncSessionLocal() as db:
+        payment = await get_payment(db, payment_id)
+    if not payment:
+        logger.warning("Платеж %s не найден, чек не отправлен", payment_id)
+        return
+    
+    # Подготавливаем данные для чека
+    receipt_data = {
+        "payment_id": payment.id,
+        "payment_date": payment.created_at.strftime("%d.%m.%Y %H:%M"),
+        "order_id": payment.order_id,
+        "customer_email": payment.customer_email,
+        "customer_phone": payment.customer_phone,
+        "payment_method": payment.payment_method,
+        "items": json.loads(payment.items_json),
+        "total_amount": payment.amount
+    }
     
+    logger.debug("Отправка чека по платежу %s", payment.id)
+    # Отправляем чек (рендеринг и запись файла - в пуле потоков)
+    if not await run_in_threadpool(email_service.send_receipt, payment.customer_email, receipt_data):
+        raise RuntimeError(f"Чек по платежу {payment_id} не отправлен")
+
+async def pending_payment_sweeper(interval: int = PENDING_SWEEP_INTERVAL):
+    """Фоновая задача: отменяет платежи, зависшие в pending, возвращает товар
+    и удаляет ключи идемпотентности с истекшим сроком"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with AsyncSessionLocal() as db:
+                released = await release_stale_payments(db)
+                await forget_expired_keys(db)
+                await db.commit()
+            if released:
+                logger.warning("Отменено зависших платежей: %s", released)
+        except Exception:
+            logger.exception("Ошибка при отмене зависших платежей")
 
 @router.get("/{payment_id}")
 async def get_payment_status(
     payment_id: int,
-    db: Session = Depends(get_db),
-    current_customer: Customer = Depends(get_current_customer)
+    db: AsyncSession = Depends(get_async_db),
+    current_customer: CurrentUser = Depends(get_current_customer)
 ):
     """Получить статус платежа"""
-    payment = get_payment(db, payment_id)
+    payment = await get_payment(db, payment_id)
     if not payment or payment.customer_id != current_customer.id:
         raise HTTPException(status_code=404, detail="Платеж не найден")
     
@@ -180,11 +296,14 @@ async def get_payment_status(
 
 @router.get("/customer/my", response_model=List[PaymentResponse])
 async def get_my_payments(
-    skip: int = 0,
+    response: Response,
+    cursor: Optional[str] = None,
     limit: int = 100,
-    db: Session = Depends(get_db),
-    current_customer: Customer = Depends(get_current_customer)
+    db: AsyncSession = Depends(get_async_db),
+    current_customer: CurrentUser = Depends(get_current_customer)
 ):
-    """Получить платежи текущего пользователя"""
-    payments = get_payments_by_customer(db, current_customer.id, skip, limit)
+    """Получить платежи текущего пользователя (курсор следующей страницы - в заголовке X-Next-Cursor)"""
+    payments, next_cursor = await get_payments_by_customer(db, current_customer.id, cursor, clamp_page_size(limit, 100))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return payments
\ No newline at end of file
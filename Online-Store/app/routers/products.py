@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from database import SessionLocal
 from fastapi.templating import Jinja2Templates
 import models
+from crud.cart import reserve_stock
 
 router = APIRouter()
 
@@ -17,13 +18,15 @@ def get_db():
         
 @router.post("/add-to-cart/")
 def add_to_cart(product_id: int, quantity: int, db: Session = Depends(get_db)):
-    product = db.query(models.Product).filter(models.Product.id == product_id).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Товар не найден")
-    if product.stock_quantity < quantity:
+    # Проверка остатка и списание - один условный UPDATE (см. /api/cart для корзины покупателя)
+    if not reserve_stock(db, product_id, quantity):
+        db.rollback()
+        product = db.query(models.Product.price).filter(models.Product.id == product_id).first()
+        if product is None:
+            raise HTTPException(status_code=404, detail="Товар не найден")
+        if product.price is None:
+            raise HTTPException(status_code=400, detail="Товар недоступен для заказа: не указана цена")
         raise HTTPException(status_code=400, detail="Недостаточно товара на складе")
-    # Логика добавления в корзину
-    product.stock_quantity -= quantity
     db.commit()
     return {"message": "Товар добавлен в корзину"}
 
@@ -3,8 +3,10 @@ from fastapi.responses import HTMLResponse, Response
 from fastapi.templating import Jinja2Templates
 from pathlib import Path
 from sqlalchemy.orm import Session
-from database import get_db
+from database import get_db, get_read_db
 import models
+from crud.review import update_product_rating
+from dependencies import get_current_user, CurrentUser
 import csv
 import io
 from datetime import datetime, timedelta
@@ -18,17 +20,15 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
 
 # Зависимость для проверки администратора или менеджера
-def require_admin_or_manager(request: Request, db: Session = Depends(get_db)):
+def require_admin_or_manager(current_user: CurrentUser = Depends(get_current_user)):
     """Требует роль администратора или менеджера"""
-    customer_id = request.session.get("user_id")
-    if not customer_id:
+    if not current_user:
         raise HTTPException(status_code=403, detail="Требуется авторизация")
     
-    customer = db.query(models.Customer).filter(models.Customer.id == customer_id).first()
-    if not customer or customer.role not in ["admin", "manager"]:
+    if current_user.role not in ["admin", "manager"]:
         raise HTTPException(status_code=403, detail="Недостаточно прав")
     
-    return customer
+    return current_user
 
 @router.get("/", response_class=HTMLResponse)
 def reports_page(
@@ -36,7 +36,7 @@ def reports_page(
     period: int = 7,  # По умолчанию 7 дней
     report_type: str = "all",  # Тип отчета: all, top_products, categories, reviews
     custom_report: str = "",  # Пользовательский тип отчета
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: models.Customer = Depends(require_admin_or_manager)
 ):
     """Страница отчетов - только для администраторов и менеджеров"""
@@ -558,7 +558,7 @@ def export_reports(
     period: int = 7,
     report_type: str = "all",  # all, top_products, categories, reviews, custom
     custom_report: str = "",
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: models.Customer = Depends(require_admin_or_manager)
 ):
     """Экспорт отчета в CSV с выбором типа отчета"""
@@ -684,7 +684,9 @@ def approve_review(
     if not review:
         raise HTTPException(status_code=404, detail="Отзыв не найден")
     
-    review.is_approved = True
+    if not review.is_approved:
+        review.is_approved = True
+        update_product_rating(db, review.product_id, review.rating, 1)
     db.commit()
     
     return {"message": "Отзыв одобрен"}
@@ -700,6 +702,8 @@ def reject_review(
     if not review:
         raise HTTPException(status_code=404, detail="Отзыв не найден")
     
+    if review.is_approved:
+        update_product_rating(db, review.product_id, review.rating, -1)
     db.delete(review)
     db.commit()
     
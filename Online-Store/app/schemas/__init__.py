@@ -1,4 +1,6 @@
 # Импортируем все схемы для удобного доступа
 from .payment import PaymentCreate, PaymentResponse, PaymentItem, DemoPaymentRequest
+from .cart import CartItemAdd, CartItemUpdate, CartItemResponse, CartResponse
 
-__all__ = ["PaymentCreate", "PaymentResponse", "PaymentItem", "DemoPaymentRequest"]
\ No newline at end of file
+__all__ = ["PaymentCreate", "PaymentResponse", "PaymentItem", "DemoPaymentRequest",
+           "CartItemAdd", "CartItemUpdate", "CartItemResponse", "CartResponse"]
\ No newline at end of file
@@ -0,0 +1,24 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import datetime
+
+class CartItemAdd(BaseModel):
+    product_id: int
+    quantity: int = Field(default=1, ge=1, le=100)
+
+class CartItemUpdate(BaseModel):
+    quantity: int = Field(ge=0, le=100)  # 0 - удалить товар из корзины
+
+class CartItemResponse(BaseModel):
+    product_id: int
+    name: str
+    price: Optional[float] = None  # None - у товара не указана цена
+    quantity: int
+    image_url: Optional[str] = None
+    reserved_until: Optional[datetime] = None
+
+class CartResponse(BaseModel):
+    items: List[CartItemResponse]
+    total_quantity: int
+    total_amount: float
+    reservation_ttl_seconds: int
\ No newline at end of file
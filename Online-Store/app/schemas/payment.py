@@ -1,19 +1,21 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
 class PaymentItem(BaseModel):
-    name: str
-    quantity: int
-    price: float
-    category: str
+    product_id: Optional[int] = None
+    quantity: int = Field(..., gt=0)
+    # Название, цена и категория берутся из каталога; от клиента не используются
+    name: Optional[str] = None
+    price: Optional[float] = None
+    category: Optional[str] = None
 
 class PaymentCreate(BaseModel):
-    order_id: int
+    order_id: Optional[int] = None  # Номер заказа назначает сервер
     customer_email: EmailStr
     customer_phone: Optional[str] = None
-    amount: float
-    items: List[PaymentItem]
+    amount: Optional[float] = None  # Сумма, которую видел покупатель (сверяется с каталогом)
+    items: List[PaymentItem] = Field(..., min_length=1)
     description: Optional[str] = None
     payment_method: Optional[str] = "demo_card"  # demo_card, demo_sbp
 
@@ -29,6 +31,18 @@ class PaymentResponse(BaseModel):
     class Config:
         from_attributes = True
 
+    @classmethod
+    def from_payment(cls, payment) -> "PaymentResponse":
+        return cls(
+            id=payment.id,
+            order_id=payment.order_id,
+            amount=payment.amount,
+            status=payment.status,
+            payment_url=f"/payments/success/{payment.id}",
+            customer_email=payment.customer_email,
+            payment_method=payment.payment_method
+        )
+
 class DemoPaymentRequest(BaseModel):
     payment_id: int
     action: str  # confirm, cancel
\ No newline at end of file
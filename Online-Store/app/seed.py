@@ -0,0 +1,261 @@
+"""
+Заполнение базы демонстрационными данными.
+
+Запуск: python seed.py (схема при необходимости обновляется миграциями)
+"""
+
+from database import SessionLocal, engine
+import models
+from crud.review import recalculate_product_ratings
+from migrations import migrate
+from services.user_import import import_users, print_import_report
+
+DEMO_USERS = [
+    {"name": "Администратор", "email": "admin@example.com", "password": "admin123", "role": "admin"},
+    {"name": "Иван Покупатель", "email": "customer@example.com", "password": "customer123", "role": "customer"},
+    {"name": "Продавец", "email": "seller@example.com", "password": "seller123", "role": "seller"},
+    {"name": "Менеджер", "email": "manager@example.com", "password": "manager123", "role": "manager"},
+    # Тестовые пользователи для отзывов
+    {"name": "Анна Смирнова", "email": "anna@example.com", "password": "password123", "role": "customer"},
+    {"name": "Петр Иванов", "email": "petr@example.com", "password": "password123", "role": "customer"},
+    {"name": "Мария Козлова", "email": "maria@example.com", "password": "password123", "role": "customer"},
+    {"name": "Сергей Петров", "email": "sergey@example.com", "password": "password123", "role": "customer"},
+]
+
+
+def create_test_data():
+    """Создание тестовых данных для демонстрации"""
+    db = SessionLocal()
+    try:
+        # Проверяем, есть ли уже данные
+        if db.query(models.Customer).count() > 0:
+            print("✅ Данные уже существуют в базе")
+            return
+        
+        # Создаем категории
+        categories = [
+            models.Category(name="Смартфоны", description="Мобильные телефоны и аксессуары", type="product"),
+            models.Category(name="Ноутбуки", description="Портативные компьютеры", type="product"),
+            models.Category(name="Периферия", description="Компьютерные мыши и клавиатуры", type="product"),
+            models.Category(name="Умные технологии", description="Умные часы и умный дом", type="product"),
+        ]
+        
+        for category in categories:
+            db.add(category)
+        db.commit()
+        
+        print("✅ Категории созданы")
+
+        # Создаем продукты с разной популярностью
+        products = [
+            models.Product(
+                name="iPhone 15 Pro",
+                description="Смартфон Apple с процессором A17 Pro",
+                price=99990.00,
+                category_id=1,
+                stock_quantity=15,
+                image_url="/static/images/iphone.png",
+                popularity=95
+            ),
+            models.Product(
+                name="Samsung Galaxy S24",
+                description="Флагманский смартфон Samsung с AI",
+                price=79990.00,
+                category_id=1,
+                stock_quantity=12,
+                image_url="/static/images/samsung.png",
+                popularity=88
+            ),
+            models.Product(
+                name="MacBook Air M3",
+                description="Ноутбук Apple с чипом M3",
+                price=129990.00,
+                category_id=2,
+                stock_quantity=8,
+                image_url="/static/images/macbook.png",
+                popularity=92
+            ),
+            models.Product(
+                name="ASUS TUF Gaming F17",
+                description="Игровой ноутбук ASUS TUF Gaming F17 FX707ZC4-HX014 с полноразмерной клавиатурой и 17.3-дюймовым экраном ",
+                price=75999.00,
+                category_id=2,
+                stock_quantity=3,
+                image_url="/static/images/Asus.png",
+                popularity=67
+            ),
+            models.Product(
+                name="Мышь беспроводная Logitech G PRO X SUPERLIGHT 2",
+                description="Вы сможете выбрать подходящий режим работы в зависимости от решаемых задач, типа монитора и поверхности под манипулятором.",
+                price=2990.00,
+                category_id=3,
+                stock_quantity=25,
+                image_url="/static/images/logitech.png",
+                popularity=75
+            ),
+            models.Product(
+                name="Смарт-часы Apple Watch SE 2024 40mm",
+                description="Простые способы оставаться на связи.",
+                price=19900.00,
+                category_id=4,
+                stock_quantity=18,
+                image_url="/static/images/apple_watch.png",
+                popularity=82
+            ),
+            models.Product(
+                name="HUAWEI WATCH GT 6 Pro",
+                description="Смарт-часы HUAWEI WATCH GT 6 Pro — это умные носимые устройства.",
+                price=26999.00,
+                category_id=4,
+                stock_quantity=2,
+                image_url="/static/images/huawei.png",
+                popularity=89
+            ),
+            models.Product(
+                name="Беспроводные наушники Logitech G435 черный",
+                description="Радиочастотная гарнитура Logitech G435 LIGHTSPEED поддерживает два способа подключения – Bluetooth и радиоканал.",
+                price=5900.00,
+                category_id=3,
+                stock_quantity=30,
+                image_url="/static/images/ears.png",
+                popularity=68
+            ),
+        ]
+        
+        for product in products:
+            db.add(product)
+        db.commit()
+        
+        print("✅ Товары созданы")
+
+        # Создаем пользователей (пароли хешируются параллельно на пуле процессов)
+        stats = import_users(DEMO_USERS, verbose=False)
+        print_import_report(stats)
+
+        users = {
+            customer.email: customer
+            for customer in db.query(models.Customer).filter(
+                models.Customer.email.in_([user["email"] for user in DEMO_USERS])
+            )
+        }
+        customer_user = users["customer@example.com"]
+        test_customers = [users[email] for email in (
+            "anna@example.com", "petr@example.com", "maria@example.com", "sergey@example.com"
+        )]
+        
+        print("✅ Пользователи созданы")
+
+        # Создаем тестовые отзывы
+        reviews = [
+            models.Review(
+                customer_id=customer_user.id,
+                product_id=1,  # iPhone 15 Pro
+                rating=5,
+                title="Отличный смартфон!",
+                comment="Пользуюсь уже месяц, все работает идеально. Камера просто супер!",
+                is_approved=True
+            ),
+            models.Review(
+                customer_id=test_customers[0].id,
+                product_id=1,  # iPhone 15 Pro
+                rating=4,
+                title="Хороший телефон, но дорогой",
+                comment="Качество на высоте, но цена завышена. Батарея держит хорошо.",
+                is_approved=True
+            ),
+            models.Review(
+                customer_id=test_customers[1].id,
+                product_id=3,  # MacBook Air M3
+                rating=5,
+                title="Лучший ноутбук для работы",
+                comment="Работаю с ним уже 2 месяца - ни разу не завис. Очень доволен покупкой!",
+                is_approved=True
+            ),
+            models.Review(
+                customer_id=test_customers[2].id,
+                product_id=6,  # Apple Watch SE
+                rating=4,
+                title="Удобные и функциональные часы",
+                comment="Отслеживание активности очень точное. Дизайн стильный.",
+                is_approved=True
+            ),
+            models.Review(
+                customer_id=test_customers[3].id,
+                product_id=5,  # Наушники Logitech
+                rating=5,
+                title="Отличный звук!",
+                comment="Звук чистый, бас глубокий. Пользуюсь для игр и музыки - все отлично.",
+                is_approved=True
+            ),
+            models.Review(
+                customer_id=customer_user.id,
+                product_id=2,  # Samsung Galaxy S24
+                rating=4,
+                title="Хорошая альтернатива Apple",
+                comment="AI функции действительно полезны. Камера отличная.",
+                is_approved=True
+            )
+        ]
+        
+        for review in reviews:
+            db.add(review)
+        db.flush()
+        recalculate_product_ratings(db)
+        
+        db.commit()
+        print("✅ Отзывы созданы")
+        
+        print("\n🎉 Тестовые данные успешно добавлены!")
+        print("\n👥 Пользователи:")
+        print("📧 Админ - Логин: admin@example.com")
+        print("🔑 Админ - Пароль: admin123")
+        print("👤 Админ - Роль: admin")
+        print("---")
+        print("📧 Покупатель - Логин: customer@example.com")
+        print("🔑 Покупатель - Пароль: customer123")
+        print("👤 Покупатель - Роль: customer")
+        print("---")
+        print("📧 Продавец - Логин: seller@example.com")
+        print("🔑 Продавец - Пароль: seller123")
+        print("👤 Продавец - Роль: seller")
+        print("---")
+        print("📧 Менеджер - Логин: manager@example.com")
+        print("🔑 Менеджер - Пароль: manager123")
+        print("👤 Менеджер - Роль: manager")
+        
+        print(f"\n📊 Статистика:")
+        print(f"📦 Категории: {len(categories)}")
+        print(f"🛍️ Товары: {len(products)}")
+        print(f"👥 Пользователи: {len(test_customers) + 4}")
+        print(f"⭐ Отзывы: {len(reviews)}")
+        
+        print(f"\n🏆 Рейтинг популярности товаров:")
+        sorted_products = sorted(products, key=lambda x: x.popularity, reverse=True)
+        for i, product in enumerate(sorted_products, 1):
+            print(f"  {i}. {product.name}: {product.popularity} баллов")
+        
+        print(f"\n🔐 Права доступа:")
+        print("  • Админ: полный доступ ко всему")
+        print("  • Продавец: админ-панель, товары, корзина")
+        print("  • Менеджер: отчеты, товары, корзина")
+        print("  • Покупатель: товары, корзина, отзывы")
+        
+        print(f"\n🛡️  Система защиты от DDoS активна:")
+        print("  • Ограничение запросов: 60/минуту")
+        print("  • Фильтрация User-Agent: активна")
+        print("  • Мониторинг: /admin/security-status")
+        print("  • Тест защиты: /test/ddos-simulation")
+        print("  • Тест User-Agent: /test/suspicious-agent")
+        
+    except Exception as e:
+        print(f"❌ Ошибка создания тестовых данных: {e}")
+        db.rollback()
+        import traceback
+        traceback.print_exc()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    migrate(engine)
+    create_test_data()
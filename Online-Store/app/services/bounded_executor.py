@@ -0,0 +1,86 @@
+import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+
+class ExecutorOverloaded(Exception):
+    """Очередь ожидания заполнена - задача отклонена"""
+
+
+class BoundedExecutor:
+    """Пул потоков для CPU-тяжелых операций с ограничением параллелизма.
+
+    Одновременно выполняется не более max_workers задач, еще не более
+    max_queue ждут своей очереди; остальные сразу получают ExecutorOverloaded,
+    чтобы всплеск запросов не копил бесконечную очередь. Счетчики меняются
+    только из потока event loop, поэтому блокировки не нужны.
+    """
+
+    def __init__(self, name: str, max_workers: int = 4, max_queue: int = 100):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop = None
+        self.running = 0
+        self.waiting = 0
+        self.max_waiting_seen = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait_seconds = 0.0
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Семафор создается лениво внутри работающего event loop (и заново для нового loop)
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+            self._loop = loop
+        return self._semaphore
+
+    async def run(self, func: Callable, *args):
+        """Выполняет func(*args) в пуле, не блокируя event loop"""
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise ExecutorOverloaded(f"{self.name}: очередь заполнена ({self.waiting})")
+
+        semaphore = self._get_semaphore()
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        self.max_waiting_seen = max(self.max_waiting_seen, self.waiting)
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.total_wait_seconds += time.perf_counter() - queued_at
+        self.running += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool, func, *args)
+        finally:
+            self.running -= 1
+            self.completed += 1
+            semaphore.release()
+
+    def stats(self) -> dict:
+        """Метрики очереди для мониторинга"""
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "queue_depth": self.waiting,
+            "max_queue_depth_seen": self.max_waiting_seen,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.total_wait_seconds / self.completed * 1000, 2) if self.completed else 0.0
+        }
+
+
+# Пул для bcrypt: хеширование отпускает GIL, поэтому потоков достаточно
+password_executor = BoundedExecutor(
+    "password",
+    max_workers=int(os.getenv("PASSWORD_WORKERS", min(4, os.cpu_count() or 1))),
+    max_queue=int(os.getenv("PASSWORD_QUEUE_LIMIT", 100))
+)
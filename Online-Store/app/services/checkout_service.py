@@ -0,0 +1,283 @@
+import os
+import json
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
+
+from models import CartItem, Order, OrderItem, OrderStatus, Payment, Product
+from schemas.payment import PaymentCreate, PaymentResponse
+from crud.idempotency import complete_key, forget_key, forget_expired_locks, hold_key
+
+# Доставка бесплатна от FREE_DELIVERY_FROM ₽ (как в templates/checkout.html)
+DELIVERY_COST = 500
+FREE_DELIVERY_FROM = 3000
+
+# Через сколько секунд платеж в pending считается брошенным (процесс упал до ответа провайдера)
+PENDING_PAYMENT_TIMEOUT = int(os.getenv("PENDING_PAYMENT_TIMEOUT", 300))
+
+# Деньги списаны, но результат не удалось сохранить: нужна ручная сверка
+NEEDS_RECONCILIATION = "needs_reconciliation"
+
+
+class CheckoutError(Exception):
+    """Заказ не может быть оформлен; транзакция уже откачена"""
+
+
+class ProductNotFound(CheckoutError):
+    """В заказе есть несуществующий товар"""
+
+
+class OutOfStock(CheckoutError):
+    """Товара на складе меньше, чем в заказе"""
+
+
+class PriceMismatch(CheckoutError):
+    """Сумма клиента не совпадает с ценами в каталоге"""
+
+    def __init__(self, expected: float, received: float):
+        super().__init__(f"Сумма заказа изменилась: {expected} ₽ вместо {received} ₽")
+        self.expected = expected
+
+
+def delivery_cost(subtotal: float) -> float:
+    return 0 if subtotal >= FREE_DELIVERY_FROM else DELIVERY_COST
+
+
+def _requested_quantities(payment: PaymentCreate) -> Dict[int, int]:
+    """Количество по товарам (повторы одного товара складываются)"""
+    quantities = {}
+    for item in payment.items:
+        if item.product_id is None:
+            raise ProductNotFound("Не указан товар")
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    return quantities
+
+
+async def _consume_cart(db: AsyncSession, customer_id: int, product_ids) -> Dict[int, int]:
+    """Удаляет строки корзины заказанных товаров и возвращает их резерв.
+
+    Строка удаляется условным DELETE: резерв достается заказу, только если
+    его не успела вернуть на склад очистка брошенных корзин.
+    """
+    rows = (await db.execute(
+        select(CartItem.id, CartItem.product_id, CartItem.quantity).where(
+            CartItem.customer_id == customer_id,
+            CartItem.product_id.in_(product_ids)
+        )
+    )).all()
+
+    reserved = {}
+    for item_id, product_id, quantity in rows:
+        result = await db.execute(
+            delete(CartItem).where(CartItem.id == item_id, CartItem.quantity == quantity)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 1:
+            reserved[product_id] = reserved.get(product_id, 0) + quantity
+    return reserved
+
+
+async def _adjust_stock(db: AsyncSession, product_id: int, delta: int) -> bool:
+    """Списывает delta единиц (отрицательное значение возвращает на склад)"""
+    stmt = update(Product).where(Product.id == product_id)
+    if delta > 0:
+        stmt = stmt.where(Product.stock_quantity >= delta)
+    result = await db.execute(
+        stmt.values(stock_quantity=Product.stock_quantity - delta)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+async def place_order(db: AsyncSession, payment: PaymentCreate, customer_id: int,
+                      status: str = "demo_paid", idempotency_key: Optional[str] = None) -> Tuple[Order, Payment]:
+    """Оформляет заказ в одной транзакции с одним commit.
+
+    Цены берутся из Product, а не от клиента; сумма клиента только
+    сверяется с ними. Заказ, позиции, платеж и списание со склада
+    фиксируются вместе: при любой ошибке (нет товара, не хватает остатка,
+    изменилась цена) откатывается все и бросается CheckoutError.
+    Товары из корзины на сервере списываются за счет их резерва,
+    остальные - условным UPDATE, поэтому склад не уходит в минус.
+    С idempotency_key ответ сохраняется в том же commit, что и платеж.
+    Если после заказа вызывается провайдер, status="pending": ключ остается
+    незавершенным, а результат и ответ ключа фиксирует settle_payment.
+    """
+    quantities = _requested_quantities(payment)
+    try:
+        # Вставка заказа открывает пишущую транзакцию, поэтому цены и
+        # остатки ниже читаются уже под блокировкой записи
+        order_status = OrderStatus.PENDING if status == "pending" else OrderStatus.CONFIRMED
+        order = Order(customer_id=customer_id, status=order_status.value)
+        db.add(order)
+        await db.flush()
+
+        products = {
+            product.id: product
+            for product in (await db.execute(
+                select(Product).options(joinedload(Product.category))
+                .where(Product.id.in_(quantities))
+            )).scalars()
+        }
+        missing = set(quantities) - set(products)
+        if missing:
+            raise ProductNotFound(f"Товары не найдены: {sorted(missing)}")
+
+        reserved = await _consume_cart(db, customer_id, list(quantities))
+
+        items = []
+        subtotal = 0.0
+        for product_id, quantity in quantities.items():
+            product = products[product_id]
+            delta = quantity - reserved.get(product_id, 0)
+            if delta != 0 and not await _adjust_stock(db, product_id, delta):
+                raise OutOfStock(f"Недостаточно товара «{product.name}» на складе")
+
+            price = product.price or 0.0
+            db.add(OrderItem(order_id=order.id, product_id=product_id,
+                             quantity=quantity, unit_price=price))
+            items.append({
+                "product_id": product_id,
+                "name": product.name,
+                "quantity": quantity,
+                "price": price,
+                "category": product.category.name if product.category else "Электроника"
+            })
+            subtotal += price * quantity
+
+        total = round(subtotal + delivery_cost(subtotal), 2)
+        if payment.amount is not None and abs(payment.amount - total) > 0.01:
+            raise PriceMismatch(total, payment.amount)
+        order.total_amount = total
+
+        db_payment = Payment(
+            order_id=order.id,
+            customer_id=customer_id,
+            amount=total,
+            status=status,
+            customer_email=payment.customer_email,
+            customer_phone=payment.customer_phone,
+            description=payment.description,
+            payment_method=payment.payment_method,
+            items_json=json.dumps(items)
+        )
+        db.add(db_payment)
+        if idempotency_key and status != "pending":
+            await db.flush()
+            await complete_key(db, customer_id, idempotency_key,
+                               PaymentResponse.from_payment(db_payment).model_dump_json())
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    return order, db_payment
+
+
+async def _cancel_order(db: AsyncSession, order_id: int) -> None:
+    """Отменяет заказ и возвращает его товары на склад (без commit)"""
+    await db.execute(
+        update(Order).where(Order.id == order_id).values(status=OrderStatus.CANCELLED.value)
+        .execution_options(synchronize_session=False)
+    )
+    items = (await db.execute(
+        select(OrderItem.product_id, OrderItem.quantity).where(OrderItem.order_id == order_id)
+    )).all()
+    for product_id, quantity in items:
+        await _adjust_stock(db, product_id, -quantity)
+
+
+async def _finish_pending(db: AsyncSession, payment_id: int, status: str) -> bool:
+    """Переводит платеж из pending в status; False - платеж уже не в pending"""
+    result = await db.execute(
+        update(Payment).where(Payment.id == payment_id, Payment.status == "pending")
+        .values(status=status).execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+async def settle_payment(db: AsyncSession, order: Order, payment: Payment, succeeded: bool,
+                         idempotency_key: Optional[str] = None) -> Payment:
+    """Фиксирует ответ провайдера одним commit.
+
+    Успех помечает платеж оплаченным и сохраняет ответ ключа
+    идемпотентности. Неудача помечает платеж failed, отменяет заказ,
+    возвращает товар на склад и удаляет ключ, чтобы покупатель мог
+    повторить оплату с тем же ключом. Если платеж уже отменен
+    release_stale_payments, бросает CheckoutError.
+    """
+    status = "demo_paid" if succeeded else "failed"
+    try:
+        if not await _finish_pending(db, payment.id, status):
+            raise CheckoutError("Платеж отменен по таймауту, оформите заказ заново")
+        set_committed_value(payment, "status", status)
+        if succeeded:
+            await db.execute(
+                update(Order).where(Order.id == order.id).values(status=OrderStatus.CONFIRMED.value)
+                .execution_options(synchronize_session=False)
+            )
+            set_committed_value(order, "status", OrderStatus.CONFIRMED.value)
+        else:
+            await _cancel_order(db, order.id)
+            set_committed_value(order, "status", OrderStatus.CANCELLED.value)
+        if idempotency_key and succeeded:
+            await complete_key(db, payment.customer_id, idempotency_key,
+                               PaymentResponse.from_payment(payment).model_dump_json())
+        elif idempotency_key:
+            await forget_key(db, payment.customer_id, idempotency_key)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    return payment
+
+
+async def hold_for_reconciliation(db: AsyncSession, payment_id: int, customer_id: int,
+                                  idempotency_key: Optional[str] = None) -> bool:
+    """Помечает списанный, но не зафиксированный платеж для ручной сверки.
+
+    release_stale_payments отменяет только платежи в pending, поэтому заказ
+    с такой оплатой не будет отменен, а товар не вернется на склад. Ключ
+    идемпотентности остается незавершенным, чтобы повтор не списал деньги
+    второй раз. False - платеж уже не в pending.
+    """
+    try:
+        held = await _finish_pending(db, payment_id, NEEDS_RECONCILIATION)
+        if held and idempotency_key:
+            await hold_key(db, customer_id, idempotency_key)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    return held
+
+
+async def release_stale_payments(db: AsyncSession, older_than: Optional[datetime] = None) -> int:
+    """Отменяет платежи, зависшие в pending дольше PENDING_PAYMENT_TIMEOUT.
+
+    Такие платежи остаются, если процесс упал между place_order и
+    settle_payment: заказ отменяется, товар возвращается на склад, а
+    незавершенные ключи идемпотентности с истекшей арендой удаляются.
+    Возвращает число отмененных платежей.
+    """
+    cutoff = older_than or datetime.utcnow() - timedelta(seconds=PENDING_PAYMENT_TIMEOUT)
+    stale = (await db.execute(
+        select(Payment.id, Payment.order_id).where(Payment.status == "pending", Payment.created_at < cutoff)
+    )).all()
+
+    released = 0
+    try:
+        for payment_id, order_id in stale:
+            # Условный UPDATE: платеж, который успел завершиться, не трогаем
+            if await _finish_pending(db, payment_id, "failed"):
+                await _cancel_order(db, order_id)
+                released += 1
+        await forget_expired_locks(db)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    return released
@@ -0,0 +1,163 @@
+import re
+import logging
+from functools import lru_cache
+
+from services.log_service import get_logger
+
+security_logger = get_logger("security")
+request_logger = get_logger("requests")
+
+
+class UserAgentFilter:
+    def __init__(self, cache_size: int = 4096):
+        # Список подозрительных/нежелательных User-Agent
+        self.suspicious_agents = [
+            "bot", "crawler", "spider", "scraper", "python", "curl", 
+            "wget", "masscan", "sqlmap", "nikto", "zmeu", "acunetix",
+            "xenu", "nessus", "nmap", "megaindex", "mail.ru", "yandexbot"
+        ]
+        
+        # Список разрешенных нормальных браузеров
+        self.allowed_agents = [
+            "mozilla", "chrome", "safari", "firefox", "edge", "opera",
+            "webkit", "gecko", "applewebkit"
+        ]
+
+        # Оба списка компилируются в одно регулярное выражение,
+        # поэтому строка User-Agent просматривается за один проход.
+        # Разрешенные строки ищутся через lookahead и не поглощают символы,
+        # чтобы не пропустить подозрительную строку, начинающуюся внутри них
+        self.pattern = re.compile(
+            "(?P<suspicious>" + "|".join(map(re.escape, self.suspicious_agents)) + ")"
+            "|(?=(?P<allowed>" + "|".join(map(re.escape, self.allowed_agents)) + "))",
+            re.IGNORECASE
+        )
+
+        # Реальный трафик содержит лишь несколько тысяч различных User-Agent
+        self._cached_verdict = lru_cache(maxsize=cache_size)(self._classify)
+    
+    def _classify(self, user_agent: str) -> bool:
+        """Классифицирует User-Agent (без кеша)"""
+        is_normal_browser = False
+        for match in self.pattern.finditer(user_agent):
+            # Проверяем на наличие подозрительных строк
+            if match.lastgroup == "suspicious":
+                security_logger.warning("Обнаружен подозрительный User-Agent: %s", user_agent)
+                return True
+            is_normal_browser = True
+        
+        # Проверяем, что это нормальный браузер
+        if not is_normal_browser:
+            security_logger.warning("Неизвестный User-Agent: %s", user_agent)
+            return True
+        
+        return False
+
+    def is_suspicious_user_agent(self, user_agent: str) -> bool:
+        """Проверяет User-Agent на подозрительность"""
+        if not user_agent:
+            return True
+        return self._cached_verdict(user_agent)
+
+    def cache_stats(self) -> dict:
+        """Статистика кеша вердиктов"""
+        info = self._cached_verdict.cache_info()
+        return {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "max_size": info.maxsize
+        }
+
+
+class DDoSProtectionMiddleware:
+    """ASGI middleware для защиты от DDoS атак.
+
+    Работает напрямую с сообщениями ASGI: заголовки безопасности дописываются
+    в http.response.start, а ответы 403/429 отправляются без создания
+    объектов Request/Response и без промежуточного потока тела ответа.
+    """
+
+    SECURITY_HEADERS = [
+        (b"x-content-type-options", b"nosniff"),
+        (b"x-frame-options", b"DENY"),
+        (b"x-xss-protection", b"1; mode=block"),
+        (b"x-ddos-protection", b"Active"),
+    ]
+    SECURITY_HEADER_NAMES = {name for name, _ in SECURITY_HEADERS}
+
+    FORBIDDEN_BODY = "Доступ ограничен".encode("utf-8")
+    TOO_MANY_REQUESTS_BODY = "Слишком много запросов. Попробуйте позже.".encode("utf-8")
+
+    def __init__(self, app, rate_limiter, user_agent_filter):
+        self.app = app
+        self.rate_limiter = rate_limiter
+        self.user_agent_filter = user_agent_filter
+
+    async def _reject(self, send, status: int, body: bytes, extra_headers: list):
+        """Отправляет короткий ответ об отказе"""
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"text/plain; charset=utf-8"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                *extra_headers
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Получаем IP клиента
+        client = scope.get("client")
+        client_ip = client[0] if client else ""
+        path = scope["path"]
+
+        # Получаем User-Agent
+        user_agent = ""
+        for name, value in scope["headers"]:
+            if name == b"user-agent":
+                user_agent = value.decode("latin-1")
+                break
+
+        # Логируем запрос (через очередь, с учетом уровня и сэмплирования)
+        if request_logger.isEnabledFor(logging.INFO):
+            request_logger.info("Запрос", extra={"fields": {
+                "client_ip": client_ip,
+                "method": scope["method"],
+                "path": path,
+                "user_agent": user_agent[:50]
+            }})
+
+        # 1. Проверяем User-Agent
+        if self.user_agent_filter.is_suspicious_user_agent(user_agent):
+            await self._reject(send, 403, self.FORBIDDEN_BODY, [
+                (b"x-ddos-protection", b"Suspicious User-Agent detected")
+            ])
+            return
+
+        # 2. Проверяем лимит запросов (только для не-статических файлов)
+        if not path.startswith("/static/"):
+            if await self.rate_limiter.check(client_ip):
+                await self._reject(send, 429, self.TOO_MANY_REQUESTS_BODY, [
+                    (b"x-ddos-protection", b"Rate limit exceeded"),
+                    (b"retry-after", str(self.rate_limiter.block_duration).encode("latin-1"))
+                ])
+                return
+
+        # Добавляем security headers в начало ответа
+        async def send_with_security_headers(message):
+            if message["type"] == "http.response.start":
+                headers = [
+                    (name, value) for name, value in message.get("headers", [])
+                    if name.lower() not in self.SECURITY_HEADER_NAMES
+                ]
+                headers.extend(self.SECURITY_HEADERS)
+                message["headers"] = headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_security_headers)
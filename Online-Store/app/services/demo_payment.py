@@ -1,29 +1,60 @@
 import time
 import random
+import asyncio
 from typing import Dict, Any
 
-class DemoPaymentService:
-    def __init__(self):
+from services.payment_gateway import PaymentProvider, PaymentDeclined, PaymentProviderUnavailable
+
+class DemoPaymentService(PaymentProvider):
+    """Демо-провайдер внутри процесса.
+
+    Имитирует задержку сети (latency_ms ± jitter_ms) через asyncio.sleep,
+    не блокируя event loop, а также временные сбои (failure_rate) и отказы
+    банка (decline_rate). Повтор с тем же idempotency_key возвращает
+    прежний результат, как у настоящего шлюза.
+    """
+
+    name = "demo"
+
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0,
+                 failure_rate: float = 0.0, decline_rate: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.decline_rate = decline_rate
+        self._charges: Dict[str, Dict[str, Any]] = {}
         self.demo_cards = [
             {"number": "5555 5555 5555 4444", "name": "DEMO CARD", "expiry": "12/25"},
             {"number": "4111 1111 1111 1111", "name": "TEST CARD", "expiry": "10/24"}
         ]
     
-    def create_payment(self, payment_data: dict) -> Dict[str, Any]:
-        """Создание демо-платежа"""
-        time.sleep(1)
-        
+    async def charge(self, payment_id: int, amount: float, idempotency_key: str) -> Dict[str, Any]:
+        """Списание демо-платежа"""
+        if idempotency_key in self._charges:
+            return self._charges[idempotency_key]
+
+        delay_ms = max(0.0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms))
+        await asyncio.sleep(delay_ms / 1000)
+
+        if random.random() < self.failure_rate:
+            raise PaymentProviderUnavailable("demo: временная ошибка провайдера")
+        if random.random() < self.decline_rate:
+            raise PaymentDeclined("Платеж отклонен банком")
+
         demo_card = random.choice(self.demo_cards)
-        payment_id = f"demo_{int(time.time())}_{random.randint(1000, 9999)}"
-        
-        return {
-            "payment_id": payment_id,
-            "status": "pending",
-            "confirmation_url": f"/payments/demo/{payment_data['payment_id']}",
+        result = {
+            "payment_id": f"demo_{int(time.time())}_{random.randint(1000, 9999)}",
+            "status": "succeeded",
+            "amount": amount,
+            "confirmation_url": f"/payments/demo/{payment_id}",
             "demo_data": {
                 "card_number": demo_card["number"],
                 "card_name": demo_card["name"],
                 "expiry_date": demo_card["expiry"],
                 "cvv": "123"
             }
-        }
\ No newline at end of file
+        }
+        self._charges[idempotency_key] = result
+        if len(self._charges) > 10_000:
+            self._charges.pop(next(iter(self._charges)))
+        return result
\ No newline at end of file
@@ -0,0 +1,173 @@
+import os
+import json
+import random
+import asyncio
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal
+from models import Job
+from services.log_service import get_logger
+
+logger = get_logger("jobs")
+
+Handler = Callable[[dict], Awaitable[None]]
+
+
+class JobQueue:
+    """Очередь фоновых задач в таблице jobs.
+
+    Задачи переживают перезапуск: они добавляются в той же транзакции, что
+    и данные, из-за которых появились, и выполняются воркерами-корутинами
+    (не более workers одновременно). Воркер забирает задачу одним UPDATE ...
+    RETURNING с арендой на lease_seconds; если процесс упал, по истечении
+    аренды задачу заберет другой воркер. Ошибка откладывает повтор с
+    экспоненциальной задержкой, после max_attempts попыток задача
+    переходит в статус dead и больше не выполняется.
+    Обработчики получают только payload и открывают собственные сессии.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal, workers: int = 2, poll_interval: float = 1.0,
+                 lease_seconds: float = 60, backoff: float = 2.0, max_backoff: float = 300,
+                 max_attempts: int = 5):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+        self._handlers: Dict[str, Handler] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self.running = 0
+        self.succeeded = 0
+        self.retried = 0
+        self.dead = 0
+
+    def handler(self, kind: str):
+        """Декоратор: регистрирует обработчик задач вида kind"""
+        def register(func: Handler) -> Handler:
+            self._handlers[kind] = func
+            return func
+        return register
+
+    async def enqueue(self, db: AsyncSession, kind: str, payload: dict,
+                      max_attempts: Optional[int] = None) -> Job:
+        """Добавляет задачу (без commit - попадет в commit вызывающего кода)"""
+        job = Job(kind=kind, payload_json=json.dumps(payload), status="pending",
+                  attempts=0, max_attempts=max_attempts or self.max_attempts,
+                  run_after=datetime.utcnow())
+        db.add(job)
+        await db.flush()
+        return job
+
+    def notify(self):
+        """Будит воркеры после commit новой задачи, не дожидаясь poll_interval"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _claim(self):
+        """Забирает готовую задачу (или задачу с истекшей арендой)"""
+        now = datetime.utcnow()
+        candidate = select(Job.id).where(or_(
+            and_(Job.status == "pending", Job.run_after <= now),
+            and_(Job.status == "running", Job.locked_until < now)
+        )).order_by(Job.run_after).limit(1).scalar_subquery()
+        async with self.session_factory() as db:
+            row = (await db.execute(
+                update(Job).where(Job.id == candidate).values(
+                    status="running",
+                    attempts=Job.attempts + 1,
+                    locked_until=now + timedelta(seconds=self.lease_seconds)
+                ).returning(Job.id, Job.kind, Job.payload_json, Job.attempts, Job.max_attempts)
+                .execution_options(synchronize_session=False)
+            )).first()
+            await db.commit()
+        return row
+
+    async def _finish(self, job_id: int, **values):
+        async with self.session_factory() as db:
+            await db.execute(
+                update(Job).where(Job.id == job_id).values(locked_until=None, **values)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+
+    async def run_next(self) -> bool:
+        """Выполняет одну задачу; False - готовых задач нет"""
+        job = await self._claim()
+        if job is None:
+            return False
+
+        job_id, kind, payload_json, attempts, max_attempts = job
+        handler = self._handlers.get(kind)
+        self.running += 1
+        try:
+            if handler is None:
+                raise LookupError(f"Нет обработчика для задач {kind}")
+            await asyncio.wait_for(handler(json.loads(payload_json)), self.lease_seconds)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if attempts >= max_attempts or handler is None:
+                self.dead += 1
+                logger.error("Задача %s (%s) не выполнена после %s попыток: %s", job_id, kind, attempts, error)
+                await self._finish(job_id, status="dead", last_error=error, finished_at=datetime.utcnow())
+            else:
+                self.retried += 1
+                delay = min(self.max_backoff, self.backoff * 2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+                logger.warning("Задача %s (%s), попытка %s: %s; повтор через %.1f с", job_id, kind, attempts, error, delay)
+                await self._finish(job_id, status="pending", last_error=error,
+                                   run_after=datetime.utcnow() + timedelta(seconds=delay))
+        else:
+            self.succeeded += 1
+            await self._finish(job_id, status="done", finished_at=datetime.utcnow())
+        finally:
+            self.running -= 1
+        return True
+
+    async def _worker(self):
+        while True:
+            # Сбрасываем до выборки, чтобы не пропустить notify во время нее
+            self._wakeup.clear()
+            try:
+                if await self.run_next():
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Ошибка воркера очереди задач")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """Запускает воркеры в текущем event loop"""
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "succeeded": self.succeeded,
+            "retried": self.retried,
+            "dead": self.dead
+        }
+
+
+job_queue = JobQueue(
+    workers=int(os.getenv("JOB_WORKERS", 2)),
+    poll_interval=float(os.getenv("JOB_POLL_INTERVAL", 1.0)),
+    max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", 5))
+)
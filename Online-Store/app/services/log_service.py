@@ -0,0 +1,178 @@
+import os
+import sys
+import json
+import queue
+import random
+import atexit
+import logging
+import threading
+from datetime import datetime
+from logging.handlers import QueueHandler
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Форматирует запись лога в одну строку JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        # Дополнительные поля, переданные через extra={"fields": {...}}
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает только долю записей ниже уровня WARNING"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.rate >= 1:
+            return True
+        return random.random() < self.rate
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Кладет записи в ограниченную очередь и никогда не ждет.
+
+    При переполнении очереди запись отбрасывается, чтобы логирование
+    не замедляло обработку запросов.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Здесь только подставляются аргументы сообщения, JSON собирает фоновый поток
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BatchWriter:
+    """Фоновый поток, который пишет записи из очереди пачками JSON-строк"""
+
+    _STOP = object()
+
+    def __init__(self, log_queue: queue.Queue, stream, batch_size: int = 100, flush_interval: float = 0.5):
+        self.queue = log_queue
+        self.stream = stream
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.formatter = JsonLinesFormatter()
+        self.written = 0
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        try:
+            self.queue.put(self._STOP, timeout=1)
+        except queue.Full:
+            pass
+        self._thread.join(timeout=5)
+
+    def _run(self):
+        running = True
+        while running:
+            try:
+                record = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            batch = [record]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines = []
+            for item in batch:
+                if item is self._STOP:
+                    running = False
+                    continue
+                lines.append(self.formatter.format(item))
+
+            if lines:
+                self._write(lines)
+
+    def _write(self, lines):
+        try:
+            self.stream.write("\n".join(lines) + "\n")
+            self.stream.flush()
+            self.written += len(lines)
+        except Exception:
+            # Ошибки вывода не должны останавливать поток записи
+            pass
+
+
+_handler = None
+_writer = None
+
+
+def setup_logging():
+    """Настраивает очередь логов и фоновый поток записи (один раз на процесс).
+
+    Параметры задаются переменными окружения:
+    LOG_LEVEL - уровень (по умолчанию INFO);
+    LOG_SAMPLE_RATE - доля сохраняемых записей уровня ниже WARNING;
+    LOG_FILE - файл для JSON-строк (по умолчанию stdout);
+    LOG_QUEUE_SIZE, LOG_BATCH_SIZE - размер очереди и пачки записи.
+    """
+    global _handler, _writer
+    if _handler is not None:
+        return
+
+    level = os.getenv("LOG_LEVEL", "INFO").upper()
+    sample_rate = float(os.getenv("LOG_SAMPLE_RATE", 1.0))
+    log_file = os.getenv("LOG_FILE")
+    stream = open(log_file, "a", encoding="utf-8") if log_file else sys.stdout
+
+    log_queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", 10000)))
+    _handler = NonBlockingQueueHandler(log_queue)
+    _handler.addFilter(SamplingFilter(sample_rate))
+    _writer = BatchWriter(log_queue, stream, batch_size=int(os.getenv("LOG_BATCH_SIZE", 100)))
+    _writer.start()
+    atexit.register(_writer.stop)
+
+    app_logger = logging.getLogger("shop")
+    app_logger.setLevel(level)
+    app_logger.addHandler(_handler)
+    app_logger.propagate = False
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Логгер приложения (дочерний для "shop")"""
+    return logging.getLogger(f"shop.{name}")
+
+
+def logging_stats() -> dict:
+    """Статистика очереди логов"""
+    if _handler is None:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "level": logging.getLevelName(logging.getLogger("shop").level),
+        "queue_size": _handler.queue.qsize(),
+        "dropped": _handler.dropped,
+        "written": _writer.written
+    }
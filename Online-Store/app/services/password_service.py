@@ -0,0 +1,134 @@
+import os
+import time
+import threading
+from typing import Optional
+
+import bcrypt
+
+from services.bounded_executor import password_executor
+from services.log_service import get_logger
+
+logger = get_logger("security")
+
+
+def hash_with_rounds(password: str, rounds: int) -> str:
+    """Хеширование пароля с заданной стоимостью (подходит для пула процессов)"""
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def hash_cost(hashed_password: str) -> Optional[int]:
+    """Стоимость (log2 числа раундов) из bcrypt-хеша вида $2b$12$..."""
+    try:
+        return int(hashed_password.split("$")[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    """Хеширование и проверка паролей bcrypt.
+
+    Стоимость задается BCRYPT_ROUNDS или подбирается при старте так, чтобы
+    один хеш занимал около target_ms, но не ниже min_rounds (базовая 12). Семафор ограничивает число одновременных
+    операций bcrypt во всем процессе, чтобы поток входов не занял весь CPU.
+    """
+
+    PROBE_ROUNDS = 8
+
+    def __init__(self, rounds: Optional[int] = None, target_ms: float = 250,
+                 min_rounds: int = 12, max_rounds: int = 15, max_concurrent: int = 4):
+        self._rounds = rounds
+        self.target_ms = target_ms
+        self.min_rounds = min_rounds
+        self.max_rounds = max_rounds
+        self.max_concurrent = max_concurrent
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+        self._calibrate_lock = threading.Lock()
+        self.calibrated_ms: Optional[float] = None
+        self.rehashed = 0
+
+    @property
+    def rounds(self) -> int:
+        if self._rounds is None:
+            self.calibrate()
+        return self._rounds
+
+    def calibrate(self) -> int:
+        """Замеряет bcrypt на этом CPU и выбирает стоимость под целевую задержку"""
+        with self._calibrate_lock:
+            if self._rounds is not None:
+                return self._rounds
+
+            start = time.perf_counter()
+            hash_with_rounds("calibration", self.PROBE_ROUNDS)
+            probe_ms = (time.perf_counter() - start) * 1000
+
+            # Каждый дополнительный раунд удваивает время хеширования
+            rounds = self.PROBE_ROUNDS
+            while rounds < self.max_rounds and probe_ms * 2 ** (rounds + 1 - self.PROBE_ROUNDS) <= self.target_ms:
+                rounds += 1
+            self._rounds = max(self.min_rounds, rounds)
+            self.calibrated_ms = round(probe_ms * 2 ** (self._rounds - self.PROBE_ROUNDS), 1)
+            logger.info("Стоимость bcrypt: %s (~%s мс на хеш)", self._rounds, self.calibrated_ms)
+            return self._rounds
+
+    def hash(self, password: str) -> str:
+        """Хеширование пароля с текущей стоимостью"""
+        rounds = self.rounds
+        with self._semaphore:
+            return hash_with_rounds(password, rounds)
+
+    def verify(self, password: str, hashed_password: str) -> bool:
+        """Проверка пароля"""
+        if not password or not hashed_password:
+            return False
+        with self._semaphore:
+            try:
+                return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+            except ValueError:
+                # Поврежденный или не bcrypt-хеш
+                return False
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        """Хеш слабее текущей стоимости и должен быть пересчитан.
+
+        Более стойкие хеши не понижаются: иначе воркеры с разной
+        калибровкой перехешировали бы одну учетную запись туда и обратно.
+        """
+        cost = hash_cost(hashed_password)
+        return cost is not None and cost < self.rounds
+
+    async def hash_async(self, password: str) -> str:
+        """Хеширование в ограниченном пуле потоков (ExecutorOverloaded при перегрузке)"""
+        return await password_executor.run(self.hash, password)
+
+    async def verify_async(self, password: str, hashed_password: str) -> bool:
+        """Проверка в ограниченном пуле потоков (ExecutorOverloaded при перегрузке)"""
+        return await password_executor.run(self.verify, password, hashed_password)
+
+    def stats(self) -> dict:
+        return {
+            "rounds": self.rounds,
+            "target_ms": self.target_ms,
+            "calibrated_ms": self.calibrated_ms,
+            "max_concurrent": self.max_concurrent,
+            "rehashed_on_login": self.rehashed,
+            "executor": password_executor.stats()
+        }
+
+
+password_hasher = PasswordHasher(
+    rounds=int(os.environ["BCRYPT_ROUNDS"]) if os.getenv("BCRYPT_ROUNDS") else None,
+    target_ms=float(os.getenv("PASSWORD_HASH_TARGET_MS", 250)),
+    min_rounds=int(os.getenv("BCRYPT_MIN_ROUNDS", 12)),
+    max_concurrent=int(os.getenv("PASSWORD_MAX_CONCURRENT", password_executor.max_workers))
+)
+
+
+def hash_password(password: str) -> str:
+    """Хеширование пароля"""
+    return password_hasher.hash(password)
+
+
+def check_password(password: str, hashed_password: str) -> bool:
+    """Проверка пароля"""
+    return password_hasher.verify(password, hashed_password)
@@ -0,0 +1,125 @@
+import os
+import random
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+
+from services.log_service import get_logger
+
+logger = get_logger("payments")
+
+
+class PaymentProviderError(Exception):
+    """Платеж не проведен"""
+
+
+class PaymentDeclined(PaymentProviderError):
+    """Провайдер отклонил платеж (повторять бессмысленно)"""
+
+
+class PaymentProviderUnavailable(PaymentProviderError):
+    """Временный сбой провайдера или таймаут (можно повторить)"""
+
+
+class PaymentProvider(ABC):
+    """Интерфейс платежного провайдера.
+
+    charge должен быть идемпотентным по idempotency_key: повтор после
+    таймаута не списывает деньги второй раз, а возвращает прежний результат.
+    """
+
+    name = "provider"
+
+    @abstractmethod
+    async def charge(self, payment_id: int, amount: float, idempotency_key: str) -> Dict[str, Any]:
+        """Списывает amount; бросает PaymentDeclined или PaymentProviderUnavailable"""
+
+
+class PaymentGateway:
+    """Вызов провайдера с ограниченными таймаутом и числом повторов.
+
+    Каждая попытка ограничена timeout секундами, временные сбои повторяются
+    не более max_retries раз с экспоненциальной задержкой и джиттером,
+    поэтому запрос оформления заказа ждет провайдера не дольше
+    (max_retries + 1) * timeout + сумма задержек. Отказ (PaymentDeclined)
+    не повторяется.
+    """
+
+    def __init__(self, provider: PaymentProvider, timeout: float = 2.0, max_retries: int = 2,
+                 backoff: float = 0.2, max_backoff: float = 1.0):
+        self.provider = provider
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.succeeded = 0
+        self.declined = 0
+        self.failed = 0
+        self.retries = 0
+        self.timeouts = 0
+
+    async def charge(self, payment_id: int, amount: float, idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        """Проводит платеж; бросает PaymentDeclined или PaymentProviderUnavailable"""
+        idempotency_key = idempotency_key or f"payment-{payment_id}"
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.retries += 1
+                delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+            try:
+                result = await asyncio.wait_for(
+                    self.provider.charge(payment_id, amount, idempotency_key), self.timeout
+                )
+                self.succeeded += 1
+                return result
+            except PaymentDeclined:
+                self.declined += 1
+                raise
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                last_error = PaymentProviderUnavailable(f"{self.provider.name}: нет ответа за {self.timeout} с")
+            except PaymentProviderUnavailable as e:
+                last_error = e
+            logger.warning("Платеж %s, попытка %s: %s", payment_id, attempt + 1, last_error)
+
+        self.failed += 1
+        raise PaymentProviderUnavailable(
+            f"Платежный сервис недоступен ({self.max_retries + 1} попыток)"
+        ) from last_error
+
+    def stats(self) -> dict:
+        return {
+            "provider": self.provider.name,
+            "timeout_seconds": self.timeout,
+            "max_retries": self.max_retries,
+            "succeeded": self.succeeded,
+            "declined": self.declined,
+            "failed": self.failed,
+            "retries": self.retries,
+            "timeouts": self.timeouts
+        }
+
+
+def create_payment_gateway() -> PaymentGateway:
+    """Шлюз с демо-провайдером, настроенный переменными окружения.
+
+    По умолчанию демо-провайдер отвечает сразу и без сбоев; задержку и
+    долю ошибок задают явно (переменными окружения или в тестах).
+    """
+    from services.demo_payment import DemoPaymentService
+
+    provider = DemoPaymentService(
+        latency_ms=float(os.getenv("PAYMENT_PROVIDER_LATENCY_MS", 0)),
+        jitter_ms=float(os.getenv("PAYMENT_PROVIDER_JITTER_MS", 0)),
+        failure_rate=float(os.getenv("PAYMENT_PROVIDER_FAILURE_RATE", 0)),
+        decline_rate=float(os.getenv("PAYMENT_PROVIDER_DECLINE_RATE", 0))
+    )
+    return PaymentGateway(
+        provider,
+        timeout=float(os.getenv("PAYMENT_TIMEOUT_SECONDS", 2)),
+        max_retries=int(os.getenv("PAYMENT_MAX_RETRIES", 2))
+    )
+
+
+payment_gateway = create_payment_gateway()
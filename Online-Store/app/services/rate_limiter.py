@@ -0,0 +1,327 @@
+import os
+import sys
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict
+
+from starlette.concurrency import run_in_threadpool
+
+from services.log_service import get_logger
+
+logger = get_logger("security")
+
+
+class BaseRateLimiter(ABC):
+    """Общая логика скользящего окна (sliding window counter).
+
+    Бэкенд хранит для каждого IP начало текущего окна и два счетчика
+    (предыдущее и текущее окно), поэтому проверка выполняется за O(1).
+    """
+
+    backend_name = "base"
+
+    def __init__(self, max_requests_per_minute: int = 60, block_duration: int = 300,
+                 max_tracked_ips: int = 100_000, idle_ttl: int = 120):
+        self.max_requests_per_minute = max_requests_per_minute  # Максимум 60 запросов в минуту
+        self.window = 60
+        self.block_duration = block_duration  # Блокировка на 5 минут
+        self.max_tracked_ips = max_tracked_ips  # Верхняя граница памяти
+        self.idle_ttl = idle_ttl  # IP без запросов дольше TTL забываются
+
+    def _advance_window(self, window_start: float, prev_count: int, cur_count: int, current_time: float):
+        """Сдвигает окно и возвращает (начало окна, предыдущий, текущий, оценка)"""
+        elapsed = current_time - window_start
+        if elapsed >= self.window:
+            windows_passed = int(elapsed // self.window)
+            prev_count = cur_count if windows_passed == 1 else 0
+            cur_count = 0
+            window_start += windows_passed * self.window
+            elapsed = current_time - window_start
+
+        # Оценка числа запросов за последние 60 секунд
+        previous_weight = (self.window - elapsed) / self.window
+        estimated = prev_count * previous_weight + cur_count
+        return window_start, prev_count, cur_count, estimated
+
+    @abstractmethod
+    def is_rate_limited(self, ip: str) -> bool:
+        """Проверяет, не превышен ли лимит запросов для IP"""
+
+    async def check(self, ip: str) -> bool:
+        """is_rate_limited для вызова из event loop"""
+        return self.is_rate_limited(ip)
+
+    @abstractmethod
+    def get_blocked_ips(self) -> Dict[str, float]:
+        """Заблокированные IP и время окончания блокировки"""
+
+    @abstractmethod
+    def active_ips_count(self) -> int:
+        """Число отслеживаемых IP"""
+
+    @abstractmethod
+    def memory_usage(self) -> dict:
+        """Оценка занимаемых ресурсов"""
+
+
+class RateLimiter(BaseRateLimiter):
+    """Ограничитель в памяти процесса (используется по умолчанию).
+
+    Неактивные IP вытесняются по TTL, а при переполнении - по LRU.
+    Состояние не разделяется между воркерами uvicorn.
+    """
+
+    backend_name = "memory"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # ip -> [начало окна, счетчик предыдущего окна, счетчик текущего окна, последний запрос]
+        self.requests = OrderedDict()
+        self.blocked_ips = OrderedDict()
+        self.evicted_ips = 0
+
+    def _evict(self, current_time: float):
+        """Удаляет простаивающие и лишние записи (амортизированно O(1))"""
+        # Записи упорядочены по времени последнего обращения,
+        # поэтому простаивающие IP всегда находятся в начале словаря
+        while self.requests:
+            ip, entry = next(iter(self.requests.items()))
+            if len(self.requests) <= self.max_tracked_ips and current_time - entry[3] < self.idle_ttl:
+                break
+            self.requests.popitem(last=False)
+            self.evicted_ips += 1
+
+        while self.blocked_ips:
+            ip, block_until = next(iter(self.blocked_ips.items()))
+            if len(self.blocked_ips) <= self.max_tracked_ips and current_time < block_until:
+                break
+            self.blocked_ips.popitem(last=False)
+
+    def is_rate_limited(self, ip: str) -> bool:
+        """Проверяет, не превышен ли лимит запросов для IP"""
+        current_time = time.time()
+
+        # Проверяем, не заблокирован ли IP
+        block_until = self.blocked_ips.get(ip)
+        if block_until is not None:
+            if current_time < block_until:
+                return True
+            del self.blocked_ips[ip]
+
+        entry = self.requests.get(ip)
+        if entry is None:
+            entry = [current_time, 0, 0, current_time]
+            self.requests[ip] = entry
+        else:
+            self.requests.move_to_end(ip)
+            entry[3] = current_time
+
+        entry[0], entry[1], entry[2], estimated = self._advance_window(
+            entry[0], entry[1], entry[2], current_time
+        )
+
+        self._evict(current_time)
+
+        # Проверяем лимит
+        if estimated >= self.max_requests_per_minute:
+            # Блокируем IP на 5 минут (блокировки отсортированы по сроку окончания)
+            self.blocked_ips[ip] = current_time + self.block_duration
+            self.requests.pop(ip, None)
+            logger.warning("IP %s заблокирован за превышение лимита запросов", ip)
+            return True
+
+        # Учитываем текущий запрос
+        entry[2] += 1
+        return False
+
+    def get_blocked_ips(self) -> Dict[str, float]:
+        return dict(self.blocked_ips)
+
+    def active_ips_count(self) -> int:
+        return len(self.requests)
+
+    def memory_usage(self) -> dict:
+        """Оценка памяти, занимаемой состоянием ограничителя"""
+        entry_size = 0
+        if self.requests:
+            ip, entry = next(iter(self.requests.items()))
+            entry_size = sys.getsizeof(ip) + sys.getsizeof(entry) + sum(sys.getsizeof(v) for v in entry)
+        blocked_size = 0
+        if self.blocked_ips:
+            ip, block_until = next(iter(self.blocked_ips.items()))
+            blocked_size = sys.getsizeof(ip) + sys.getsizeof(block_until)
+
+        total = (
+            sys.getsizeof(self.requests) + entry_size * len(self.requests) +
+            sys.getsizeof(self.blocked_ips) + blocked_size * len(self.blocked_ips)
+        )
+        return {
+            "tracked_ips": len(self.requests),
+            "max_tracked_ips": self.max_tracked_ips,
+            "idle_ttl_seconds": self.idle_ttl,
+            "evicted_ips": self.evicted_ips,
+            "estimated_bytes": total
+        }
+
+
+class SQLiteRateLimiter(BaseRateLimiter):
+    """Ограничитель с общим состоянием в SQLite (WAL).
+
+    Все воркеры uvicorn на одном узле работают с одним файлом, поэтому
+    лимит и блокировки действуют сразу для всех процессов. Каждая проверка
+    выполняется в транзакции BEGIN IMMEDIATE, что делает инкремент атомарным.
+    Проверка блокирующая, поэтому check выполняет ее в пуле потоков, а не
+    в event loop. Если файл недоступен или занят дольше lock_timeout,
+    запрос пропускается без проверки (fail open) и это пишется в лог.
+    """
+
+    backend_name = "sqlite"
+
+    def __init__(self, path: str = "./rate_limits.db", cleanup_every: int = 1000,
+                 lock_timeout: float = 1.0, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.cleanup_every = cleanup_every  # Очистка устаревших записей раз в N запросов
+        self.lock_timeout = lock_timeout  # Ожидание блокировки файла, секунд
+        self._calls = 0
+        self.failed_checks = 0  # Проверки, пропущенные из-за ошибок SQLite
+        self._local = threading.local()
+        self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None - транзакциями управляем вручную
+            conn = sqlite3.connect(self.path, timeout=self.lock_timeout, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS rate_limits (
+                ip TEXT PRIMARY KEY,
+                window_start REAL NOT NULL,
+                prev_count INTEGER NOT NULL,
+                cur_count INTEGER NOT NULL,
+                last_seen REAL NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS blocked_ips (
+                ip TEXT PRIMARY KEY,
+                blocked_until REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_rate_limits_last_seen ON rate_limits (last_seen)")
+
+    def _cleanup(self, conn: sqlite3.Connection, current_time: float):
+        """Удаляет простаивающие IP и истекшие блокировки"""
+        conn.execute("DELETE FROM rate_limits WHERE last_seen < ?", (current_time - self.idle_ttl,))
+        conn.execute("DELETE FROM blocked_ips WHERE blocked_until <= ?", (current_time,))
+
+    def _check(self, conn: sqlite3.Connection, ip: str, current_time: float) -> bool:
+        """Тело проверки; выполняется внутри открытой транзакции"""
+        self._calls += 1
+        if self._calls % self.cleanup_every == 0:
+            self._cleanup(conn, current_time)
+
+        # Проверяем, не заблокирован ли IP
+        row = conn.execute("SELECT blocked_until FROM blocked_ips WHERE ip = ?", (ip,)).fetchone()
+        if row and current_time < row[0]:
+            return True
+
+        row = conn.execute(
+            "SELECT window_start, prev_count, cur_count FROM rate_limits WHERE ip = ?", (ip,)
+        ).fetchone()
+        window_start, prev_count, cur_count = row if row else (current_time, 0, 0)
+        window_start, prev_count, cur_count, estimated = self._advance_window(
+            window_start, prev_count, cur_count, current_time
+        )
+
+        # Проверяем лимит
+        if estimated >= self.max_requests_per_minute:
+            conn.execute(
+                "INSERT OR REPLACE INTO blocked_ips (ip, blocked_until) VALUES (?, ?)",
+                (ip, current_time + self.block_duration)
+            )
+            conn.execute("DELETE FROM rate_limits WHERE ip = ?", (ip,))
+            logger.warning("IP %s заблокирован за превышение лимита запросов", ip)
+            return True
+
+        # Учитываем текущий запрос
+        conn.execute(
+            "INSERT OR REPLACE INTO rate_limits (ip, window_start, prev_count, cur_count, last_seen) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (ip, window_start, prev_count, cur_count + 1, current_time)
+        )
+        return False
+
+    def is_rate_limited(self, ip: str) -> bool:
+        """Проверяет, не превышен ли лимит запросов для IP (блокирующий вызов)"""
+        current_time = time.time()
+        try:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                limited = self._check(conn, ip, current_time)
+                conn.execute("COMMIT")
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+        except sqlite3.OperationalError as e:
+            # Хранилище лимитов занято или недоступно - не роняем запрос
+            self.failed_checks += 1
+            logger.warning("Проверка лимита для %s пропущена: %s", ip, e)
+            return False
+        return limited
+
+    async def check(self, ip: str) -> bool:
+        """Выполняет проверку в пуле потоков, не блокируя event loop"""
+        return await run_in_threadpool(self.is_rate_limited, ip)
+
+    def get_blocked_ips(self) -> Dict[str, float]:
+        rows = self._connect().execute("SELECT ip, blocked_until FROM blocked_ips").fetchall()
+        return dict(rows)
+
+    def active_ips_count(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM rate_limits").fetchone()[0]
+
+    def memory_usage(self) -> dict:
+        """Размер общего файла состояния"""
+        conn = self._connect()
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        return {
+            "tracked_ips": self.active_ips_count(),
+            "idle_ttl_seconds": self.idle_ttl,
+            "database_path": self.path,
+            "failed_checks": self.failed_checks,
+            "estimated_bytes": page_count * page_size
+        }
+
+
+def create_rate_limiter() -> BaseRateLimiter:
+    """Создает ограничитель согласно переменной окружения RATE_LIMIT_BACKEND.
+
+    memory (по умолчанию) - состояние в памяти процесса;
+    sqlite - общее состояние для всех воркеров узла (файл RATE_LIMIT_DB).
+    """
+    backend = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+    settings = {
+        "max_requests_per_minute": int(os.getenv("RATE_LIMIT_PER_MINUTE", 60)),
+        "block_duration": int(os.getenv("RATE_LIMIT_BLOCK_SECONDS", 300)),
+    }
+    if backend == "sqlite":
+        return SQLiteRateLimiter(
+            path=os.getenv("RATE_LIMIT_DB", "./rate_limits.db"),
+            lock_timeout=float(os.getenv("RATE_LIMIT_LOCK_TIMEOUT", 1.0)),
+            **settings
+        )
+    return RateLimiter(**settings)
@@ -0,0 +1,103 @@
+import os
+import time
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, Optional
+
+from sqlalchemy import insert, select
+
+import models
+from database import engine as default_engine
+from services.password_service import hash_with_rounds, password_hasher
+
+
+def _existing_emails(conn, emails: List[str], chunk_size: int = 500) -> set:
+    """Email из списка, которые уже есть в базе"""
+    found = set()
+    for i in range(0, len(emails), chunk_size):
+        chunk = emails[i:i + chunk_size]
+        rows = conn.execute(select(models.Customer.email).where(models.Customer.email.in_(chunk)))
+        found.update(row[0] for row in rows)
+    return found
+
+
+def import_users(users: Iterable[dict], bind=None, batch_size: int = 1000,
+                 workers: Optional[int] = None, verbose: bool = True) -> dict:
+    """Массовый импорт пользователей.
+
+    users - словари с ключами name, email, password и необязательным role.
+    Пароли хешируются bcrypt на пуле процессов (по числу ядер), а строки
+    вставляются пачками по batch_size через executemany, по одной транзакции
+    на пачку. Уже существующие email пропускаются без хеширования.
+    Возвращает статистику импорта.
+    """
+    bind = bind or default_engine
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+
+    # Отбрасываем повторы внутри списка и пользователей, которые уже есть в базе.
+    # Email не приводится к нижнему регистру: вход и регистрация
+    # (routers/auth.py) ищут его точным совпадением, как и уникальный индекс
+    unique = {}
+    for user in users:
+        unique.setdefault(user["email"].strip(), user)
+    with bind.connect() as conn:
+        existing = _existing_emails(conn, list(unique))
+    pending = [(email, user) for email, user in unique.items() if email not in existing]
+    passwords = [user["password"] for _, user in pending]
+    # Стоимость выбирается в основном процессе и передается воркерам вместе с паролем
+    rounds = repeat(password_hasher.rounds, len(passwords))
+
+    executor = None
+    if workers > 1 and len(passwords) > 1:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        # Задачи отправляются сразу: пока вставляется одна пачка, пул хеширует следующие
+        hashes = executor.map(hash_with_rounds, passwords, rounds, chunksize=max(1, min(64, len(passwords) // (workers * 4))))
+    else:
+        hashes = map(hash_with_rounds, passwords, rounds)
+
+    stmt = insert(models.Customer.__table__).prefix_with("OR IGNORE")
+    inserted = 0
+    try:
+        batch = []
+        for (email, user), hashed in zip(pending, hashes):
+            batch.append({
+                "name": user.get("name") or email,
+                "email": email,
+                "hashed_password": hashed,
+                "role": user.get("role") or "customer"
+            })
+            if len(batch) >= batch_size:
+                inserted += _insert_batch(bind, stmt, batch)
+                batch = []
+                if verbose:
+                    print(f"  ... {inserted} из {len(pending)}")
+        if batch:
+            inserted += _insert_batch(bind, stmt, batch)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "total": len(unique),
+        "inserted": inserted,
+        "skipped": len(unique) - inserted,
+        "workers": workers if executor is not None else 1,
+        "seconds": round(elapsed, 3),
+        "users_per_second": round(inserted / elapsed, 1) if elapsed > 0 else 0.0
+    }
+
+
+def _insert_batch(bind, stmt, batch: List[dict]) -> int:
+    """Вставляет пачку строк одним executemany в отдельной транзакции"""
+    with bind.begin() as conn:
+        result = conn.execute(stmt, batch)
+    return result.rowcount
+
+
+def print_import_report(stats: dict):
+    """Выводит итог импорта"""
+    print(f"✅ Импортировано пользователей: {stats['inserted']} из {stats['total']} "
+          f"(пропущено: {stats['skipped']})")
+    print(f"⏱️ {stats['seconds']} с, {stats['users_per_second']} польз./с, процессов: {stats['workers']}")
@@ -102,6 +102,366 @@ def simulate_ddos_attack():
     
     print("✅ Имитация DDoS атаки завершена")
 
+def test_query_plans():
+    """Проверка, что основные запросы используют составные индексы (EXPLAIN QUERY PLAN)"""
+    print("\n🧪 Проверка планов запросов...")
+    
+    from datetime import datetime
+    from sqlalchemy import create_engine, func, text
+    from sqlalchemy.orm import Session
+    import models
+    from migrations import migrate
+    
+    engine = create_engine("sqlite://")
+    migrate(engine)
+    db = Session(engine)
+    
+    def query_plan(query):
+        sql = query.statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+        return " | ".join(row[3] for row in db.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+    
+    Review, Product, Payment = models.Review, models.Product, models.Payment
+    start_date = datetime(2024, 1, 1)
+    cases = [
+        ("Рейтинг товаров каталога", "ix_reviews_product_approved", db.query(
+            Review.product_id, func.count(Review.id), func.avg(Review.rating)
+        ).filter(Review.product_id.in_([1, 2, 3]), Review.is_approved == True).group_by(Review.product_id)),
+        ("Лента отзывов", "ix_reviews_approved_created", db.query(Review).filter(
+            Review.is_approved == True
+        ).order_by(Review.created_at.desc(), Review.id.desc()).limit(20)),
+        ("Отчет: отзывы за период", "ix_reviews_created_at", db.query(Review).filter(
+            Review.created_at >= start_date
+        ).order_by(Review.created_at.desc()).limit(50)),
+        ("Отчет: средний рейтинг за период", "ix_reviews_approved_created", db.query(func.avg(Review.rating)).filter(
+            Review.created_at >= start_date, Review.is_approved == True
+        )),
+        ("Повторный отзыв", "ix_reviews_customer_product", db.query(Review).filter(
+            Review.customer_id == 1, Review.product_id == 2
+        )),
+        ("Каталог: категория и цена", "ix_products_category_price", db.query(Product).filter(
+            Product.category_id == 1, Product.price >= 1000, Product.price <= 50000
+        )),
+        ("Товары в наличии", "ix_products_in_stock_category_price", db.query(Product).filter(
+            Product.stock_quantity > 0
+        )),
+        ("Сортировка по рейтингу", "ix_products_rating", db.query(Product).order_by(
+            Product.average_rating.desc(), Product.review_count.desc(), Product.id.desc()
+        ).limit(24)),
+        ("История платежей", "ix_payments_customer_id", db.query(Payment).filter(
+            Payment.customer_id == 1
+        ).order_by(Payment.id.desc()).limit(100)),
+    ]
+    
+    for name, index_name, query in cases:
+        plan = query_plan(query)
+        assert index_name in plan, f"{name}: ожидался индекс {index_name}, план: {plan}"
+        assert "TEMP B-TREE" not in plan or "GROUP BY" in plan, f"{name}: лишняя сортировка, план: {plan}"
+        print(f"✅ {name}: {plan}")
+    
+    db.close()
+
+def test_login_burst():
+    """Нагрузочный тест: всплеск входов не должен замедлять каталог.
+    
+    Запускать на сервере с поднятым лимитом, например RATE_LIMIT_PER_MINUTE=100000,
+    и с тестовыми данными (python seed.py).
+    """
+    print("\n🧪 Задержка каталога во время всплеска входов...")
+    
+    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/120.0"}
+    
+    def catalog_latencies(count):
+        latencies = []
+        for _ in range(count):
+            start = time.perf_counter()
+            requests.get(f"{BASE_URL}/products/", headers=headers)
+            latencies.append((time.perf_counter() - start) * 1000)
+        latencies.sort()
+        return latencies
+    
+    def percentile(values, p):
+        return values[min(len(values) - 1, int(len(values) * p))]
+    
+    def login():
+        requests.post(
+            f"{BASE_URL}/auth/login",
+            data={"email": "admin@example.com", "password": "admin123"},
+            headers=headers,
+            allow_redirects=False
+        )
+    
+    # Задержка без нагрузки
+    baseline = catalog_latencies(20)
+    
+    # Тот же замер, пока 8 потоков непрерывно выполняют вход
+    stop = threading.Event()
+    
+    def login_worker():
+        while not stop.is_set():
+            login()
+    
+    workers = [threading.Thread(target=login_worker) for _ in range(8)]
+    for worker in workers:
+        worker.start()
+    time.sleep(0.5)
+    under_load = catalog_latencies(20)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    
+    print(f"  Без нагрузки: p50 {percentile(baseline, 0.5):.0f} мс, p95 {percentile(baseline, 0.95):.0f} мс")
+    print(f"  Во время входов: p50 {percentile(under_load, 0.5):.0f} мс, p95 {percentile(under_load, 0.95):.0f} мс")
+    
+    # Прежде каждый вход блокировал event loop на ~250 мс
+    if percentile(under_load, 0.5) < 250:
+        print("✅ Входы не блокируют обработку каталога")
+    else:
+        print("⚠️ Каталог заметно замедляется во время входов")
+
+def test_cart_no_oversell():
+    """Много потоков одновременно резервируют один товар - продано не больше остатка"""
+    print("\n🧪 Параллельное резервирование одного товара...")
+    
+    import os
+    import tempfile
+    from datetime import datetime, timedelta
+    from sqlalchemy.orm import sessionmaker
+    from database import create_sqlite_engine
+    from migrations import migrate
+    from models import Category, Product, Customer, CartItem
+    from crud.cart import InsufficientStock, CartConflict, set_cart_quantity, release_expired_reservations
+    
+    stock, threads_count, attempts = 50, 16, 10
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_sqlite_engine(f"sqlite:///{os.path.join(tmp, 'cart.db')}")
+        migrate(engine)
+        Session = sessionmaker(bind=engine, autoflush=False)
+        
+        db = Session()
+        db.add(Category(id=1, name="Тест"))
+        db.add(Product(id=1, name="Ходовой товар", price=100, category_id=1, stock_quantity=stock))
+        db.add_all([Customer(id=i, name=f"Покупатель {i}", email=f"buyer{i}@example.com") for i in range(1, threads_count + 1)])
+        db.commit()
+        db.close()
+        
+        results = defaultdict(int)
+        lock = threading.Lock()
+        
+        def buyer(customer_id):
+            session = Session()
+            for _ in range(attempts):
+                try:
+                    set_cart_quantity(session, customer_id, 1, 1, relative=True)
+                    session.commit()
+                    outcome = "reserved"
+                except (InsufficientStock, CartConflict):
+                    session.rollback()
+                    outcome = "rejected"
+                with lock:
+                    results[outcome] += 1
+            session.close()
+        
+        workers = [threading.Thread(target=buyer, args=(i,)) for i in range(1, threads_count + 1)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        
+        db = Session()
+        remaining = db.query(Product.stock_quantity).filter(Product.id == 1).scalar()
+        in_carts = sum(quantity for (quantity,) in db.query(CartItem.quantity).all())
+        print(f"  Попыток: {threads_count * attempts}, зарезервировано: {results['reserved']}, отказов: {results['rejected']}")
+        print(f"  На складе: {remaining}, в корзинах: {in_carts}")
+        assert remaining >= 0, "Остаток ушел в минус"
+        assert results["reserved"] == stock == in_carts, "Продано больше, чем было на складе"
+        assert remaining + in_carts == stock
+        
+        # Брошенные корзины возвращают товар на склад
+        db.query(CartItem).update({CartItem.reserved_until: datetime.utcnow() - timedelta(seconds=1)})
+        db.commit()
+        released = release_expired_reservations(db)
+        db.commit()
+        remaining = db.query(Product.stock_quantity).filter(Product.id == 1).scalar()
+        assert remaining == stock and db.query(CartItem).count() == 0, "Просроченные резервы не освобождены"
+        print(f"  Освобождено просроченных резервов: {released}, на складе снова {remaining}")
+        db.close()
+        engine.dispose()
+    
+    print("✅ Перепродажи нет")
+
+def test_payment_idempotency():
+    """Одновременные повторы платежа с одним Idempotency-Key создают один платеж"""
+    print("\n🧪 Одновременные повторы платежа с одним ключом идемпотентности...")
+    
+    import os
+    import asyncio
+    import tempfile
+    import httpx
+    from sqlalchemy import func, select
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    from database import create_sqlite_engine, get_async_db
+    from dependencies import get_current_customer, CurrentUser
+    from migrations import migrate
+    from models import Category, Product, Payment, Order, IdempotencyKey
+    from main import app
+    from services.demo_payment import DemoPaymentService
+    from services.payment_gateway import payment_gateway
+    
+    duplicates = 10
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "payments.db")
+        engine = create_sqlite_engine(f"sqlite:///{path}")
+        migrate(engine)
+        with engine.begin() as conn:
+            conn.execute(Category.__table__.insert(), {"id": 1, "name": "Тест"})
+            conn.execute(Product.__table__.insert(), {"id": 1, "name": "Товар", "price": 1000, "category_id": 1, "stock_quantity": 100})
+        
+        async_engine = create_sqlite_engine(f"sqlite+aiosqlite:///{path}", async_engine=True)
+        Session = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+        
+        async def override_db():
+            async with Session() as session:
+                yield session
+        
+        app.dependency_overrides[get_async_db] = override_db
+        app.dependency_overrides[get_current_customer] = lambda: CurrentUser(id=1, name="Покупатель", email="buyer@example.com", role="customer")
+        # Провайдер отвечает с задержкой, чтобы повторы пришли, пока первый запрос еще выполняется
+        provider = payment_gateway.provider
+        payment_gateway.provider = DemoPaymentService(latency_ms=300, failure_rate=0)
+        
+        body = {"customer_email": "buyer@example.com", "items": [{"product_id": 1, "quantity": 2}], "amount": 2500}
+        headers = {"User-Agent": "Mozilla/5.0 Chrome", "Idempotency-Key": "order-42"}
+        
+        async def run():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                responses = await asyncio.gather(*[
+                    client.post("/payments/create", json=body, headers=headers) for _ in range(duplicates)
+                ])
+                replay = await client.post("/payments/create", json=body, headers=headers)
+                changed = await client.post("/payments/create", json={**body, "amount": 3000}, headers=headers)
+            await async_engine.dispose()
+            return responses, replay, changed
+        
+        try:
+            responses, replay, changed = asyncio.run(run())
+        finally:
+            app.dependency_overrides.clear()
+            payment_gateway.provider = provider
+        
+        statuses = [r.status_code for r in responses]
+        payment_ids = {r.json()["id"] for r in responses if r.status_code == 200}
+        replayed = sum(1 for r in responses if r.headers.get("Idempotent-Replayed") == "true")
+        in_progress = statuses.count(409)
+        with engine.connect() as conn:
+            payments = conn.execute(select(func.count(Payment.id))).scalar()
+            orders = conn.execute(select(func.count(Order.id))).scalar()
+            stock = conn.execute(select(Product.stock_quantity).where(Product.id == 1)).scalar()
+        
+        print(f"  Ответы: {statuses}, повторов из сохраненного ответа: {replayed}, «еще выполняется»: {in_progress}")
+        print(f"  Платежей: {payments}, заказов: {orders}, остаток: {stock}")
+        # Пока первый запрос ждет провайдера, повторы получают 409, а не незавершенный ответ
+        assert set(statuses) <= {200, 409} and statuses.count(200) == replayed + 1, "Повтор получил неожиданный ответ"
+        assert all(r.json()["status"] == "demo_paid" for r in responses if r.status_code == 200)
+        assert len(payment_ids) == 1 and payments == 1 and orders == 1, "Создано несколько платежей"
+        assert stock == 98, "Товар списан больше одного раза"
+        assert replay.status_code == 200 and replay.headers.get("Idempotent-Replayed") == "true", "Завершенный запрос не повторен из сохраненного ответа"
+        assert replay.json()["id"] in payment_ids
+        assert changed.status_code == 422, "Ключ принят с другим телом запроса"
+        
+        # Процесс "упал" между заказом и ответом провайдера: платеж завис в pending
+        async def crash_and_recover():
+            from datetime import datetime, timedelta
+            from crud.idempotency import claim_key, request_hash
+            from routers.payments import IDEMPOTENCY_LOCK_TIMEOUT
+            from schemas.payment import PaymentCreate
+            from services.checkout_service import place_order, release_stale_payments
+            payment = PaymentCreate(**body)
+            async with Session() as db:
+                await claim_key(db, 1, "order-crash", request_hash(payment), IDEMPOTENCY_LOCK_TIMEOUT)
+                await place_order(db, payment, 1, status="pending", idempotency_key="order-crash")
+            async with Session() as db:
+                stored = await claim_key(db, 1, "order-crash", request_hash(payment), IDEMPOTENCY_LOCK_TIMEOUT)
+                later = datetime.utcnow() + timedelta(hours=1)
+                await db.execute(IdempotencyKey.__table__.update().values(expires_at=datetime.utcnow() - timedelta(seconds=1)))
+                released = await release_stale_payments(db, older_than=later)
+            await async_engine.dispose()
+            return stored, released
+        
+        stored, released = asyncio.run(crash_and_recover())
+        with engine.connect() as conn:
+            stock = conn.execute(select(Product.stock_quantity).where(Product.id == 1)).scalar()
+            statuses = conn.execute(select(Payment.status).order_by(Payment.id)).scalars().all()
+            keys = conn.execute(select(func.count()).select_from(IdempotencyKey)).scalar()
+        engine.dispose()
+        print(f"  После сбоя: ключ {'занят' if stored and stored.response_json is None else stored}, отменено {released}, платежи {statuses}, остаток {stock}")
+        assert stored is not None and stored.response_json is None, "Незавершенный платеж отдан как готовый ответ"
+        assert released == 1 and statuses == ["demo_paid", "failed"] and stock == 98, "Зависший платеж не отменен"
+        assert keys == 1, "Ключ зависшего платежа не освобожден"
+    
+    print("✅ Дубликатов нет")
+
+def test_job_queue_retries():
+    """Задачи очереди повторяются с задержкой, а безнадежные уходят в dead"""
+    print("\n🧪 Повторы и dead-letter в очереди задач...")
+    
+    import os
+    import asyncio
+    import tempfile
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    from database import create_sqlite_engine
+    from migrations import migrate
+    from models import Job
+    from services.job_queue import JobQueue
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "jobs.db")
+        engine = create_sqlite_engine(f"sqlite:///{path}")
+        migrate(engine)
+        async_engine = create_sqlite_engine(f"sqlite+aiosqlite:///{path}", async_engine=True)
+        Session = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+        queue = JobQueue(session_factory=Session, workers=3, poll_interval=0.05, backoff=0.05, max_attempts=3)
+        calls = defaultdict(int)
+        
+        @queue.handler("flaky")
+        async def flaky(payload):
+            calls[payload["n"]] += 1
+            if calls[payload["n"]] < 2:
+                raise RuntimeError("временная ошибка")
+        
+        @queue.handler("broken")
+        async def broken(payload):
+            raise RuntimeError("постоянная ошибка")
+        
+        async def run():
+            async with Session() as db:
+                for n in range(10):
+                    await queue.enqueue(db, "flaky", {"n": n})
+                await queue.enqueue(db, "broken", {})
+                await db.commit()
+            queue.start()
+            for _ in range(100):
+                await asyncio.sleep(0.1)
+                if queue.succeeded + queue.dead == 11:
+                    break
+            await queue.stop()
+            await async_engine.dispose()
+        
+        asyncio.run(run())
+        
+        with engine.connect() as conn:
+            statuses = dict(conn.execute(Job.__table__.select().with_only_columns(Job.status, Job.attempts).where(Job.kind == "broken")).all())
+            done = conn.execute(Job.__table__.select().where(Job.status == "done")).fetchall()
+        engine.dispose()
+        
+        print(f"  Выполнено: {queue.succeeded}, повторов: {queue.retried}, в dead: {queue.dead}")
+        assert len(done) == 10 and all(calls[n] == 2 for n in range(10)), "Задачи не выполнены после повтора"
+        assert statuses == {"dead": 3}, "Безнадежная задача не ушла в dead после max_attempts"
+    
+    print("✅ Очередь задач работает")
+
 if __name__ == "__main__":
     print("🚀 Запуск тестов DDoS защиты...")
     
@@ -109,6 +469,11 @@ if __name__ == "__main__":
     test_rate_limiting()
     test_suspicious_user_agent()
     test_security_status()
+    test_query_plans()
+    test_login_burst()
+    test_cart_no_oversell()
+    test_payment_idempotency()
+    test_job_queue_retries()
     
     # Раскомментируйте для более интенсивного тестирования
     # simulate_ddos_attack()